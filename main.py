@@ -27,4 +27,5 @@ if __name__ == "__main__":
     print(f"Books: {result['philosophy']['books_referenced']} ({result['philosophy']['selection_method']})")
     print(f"Music: {result['music']['playlist']} ({result['music']['selection_method']})")
     print(f"Learning confidence: {result['learning']['learning_confidence']:.2f}")
+    print(f"Embedding encode calls: {result['embedding']['encode_calls']} ({result['embedding']['texts_encoded']} texts)")
     print(f"Response preview: {result['philosophy']['response'][:100]}...")
\ No newline at end of file
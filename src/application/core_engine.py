@@ -1,16 +1,20 @@
 # src/application/core_engine.py - Streamlined Core JARVIS Engine
 
-from typing import Dict, List
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
 from collections import defaultdict
-import requests
 from src.modeling.simple_emotion_model import simple_emotion_classifier
 from src.modeling.intelligent_selector import intelligent_selector
 from src.modeling.self_learning_engine import self_learning_engine
 from src.vector_space.philosophy_rag import philosophy_rag
 from src.application.psychology_prompts import psychology_prompts
 from src.application.db_manager import log_emotion_session
+from src.application.ollama_client import ollama_client
 from src.application.music_engine import play_music_for_emotion
-from src.commonconst import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT
+from src.vector_space.embedding_context import EmbeddingContext
+from src.vector_space.embedding_cache import embedding_cache
+from src.commonconst import RAG_BOOK_RELOAD_INTERVAL, warm_up_embedding_model
 
 class JARVISCoreEngine:
     """Streamlined core engine with self-learning capabilities"""
@@ -21,15 +25,22 @@ class JARVISCoreEngine:
         self.learning_engine = self_learning_engine
         self.philosophy_rag = philosophy_rag
         self.psychology_prompts = psychology_prompts
+        # Concurrent sessions append to the CSV log and rewrite the learning pickle
+        self._session_lock = threading.Lock()
         
     def initialize_systems(self):
         """Initialize all AI systems"""
+        warm_up_embedding_model()
+        
         print("🔨 Initializing emotion classification...")
         test_result = self.emotion_classifier.classify_emotion_hybrid("I feel happy")
         print(f"✅ Emotion system ready: {test_result['primary_emotion']}")
         
         print("📚 Building philosophy knowledge base...")
         self.philosophy_rag.build_embeddings()
+        self.philosophy_rag.build_candidate_tables(self.emotion_classifier.get_profile_texts())
+        if RAG_BOOK_RELOAD_INTERVAL > 0:
+            self.philosophy_rag.start_book_watcher(RAG_BOOK_RELOAD_INTERVAL)
         
         print("📈 Loading learning patterns...")
         self.learning_engine.learn_from_interactions()
@@ -39,9 +50,43 @@ class JARVISCoreEngine:
     def process_emotion(self, text: str, user_id: str = "default") -> Dict:
         """Process emotional input with self-learning"""
         
+        # Every stage shares one embedding per distinct string for this request
+        context = EmbeddingContext(embedding_cache)
+        
         # Step 1: Classify emotion using hybrid approach
-        emotion_result = self.emotion_classifier.classify_emotion_hybrid(text)
-        primary_emotion = emotion_result['primary_emotion']
+        emotion_result = self.emotion_classifier.classify_emotion_hybrid(text, context)
+        
+        # Steps 2-4: Learned preferences, book selection and philosophy search
+        plan = self.plan_response(text, emotion_result['primary_emotion'], context)
+        
+        # Step 5: Generate therapeutic response
+        therapeutic_response = self.generate_therapeutic_response(
+            text, plan['primary_emotion'], plan['philosophy_sources']
+        )
+        
+        # Steps 6-9: Music, logging and learning
+        return self.complete_session(text, user_id, emotion_result, plan, therapeutic_response, context)
+    
+    async def process_emotion_async(self, text: str, user_id: str = "default",
+                                    on_token: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict:
+        """process_emotion for the event loop: LLM calls are awaited, CPU and I/O-bound steps run in worker threads
+        
+        With `on_token`, the therapeutic response is streamed and `on_token(text_so_far)`
+        is awaited as it grows; the returned result is the same either way.
+        """
+        context = EmbeddingContext(embedding_cache)
+        
+        emotion_result = await self.emotion_classifier.classify_emotion_hybrid_async(text, context)
+        plan = await asyncio.to_thread(self.plan_response, text, emotion_result['primary_emotion'], context)
+        therapeutic_response = await self.agenerate_therapeutic_response(
+            text, plan['primary_emotion'], plan['philosophy_sources'], on_token
+        )
+        return await asyncio.to_thread(
+            self.complete_session, text, user_id, emotion_result, plan, therapeutic_response, context
+        )
+    
+    def plan_response(self, text: str, primary_emotion: str, context: EmbeddingContext) -> Dict:
+        """Steps 2-4: pick books from learned preferences or the AI selector and retrieve passages"""
         
         # Step 2: Get learned preferences for this emotion
         learned_prefs = self.learning_engine.get_learned_preferences(primary_emotion)
@@ -56,49 +101,65 @@ class JARVISCoreEngine:
         else:
             # Use AI selector
             selected_books = self.intelligent_selector.select_relevant_books(
-                primary_emotion, text, top_k=complexity_analysis['recommended_book_count']
+                primary_emotion, text, top_k=complexity_analysis['recommended_book_count'], context=context
             )
             preferred_books = [book['book'] for book in selected_books]
             book_selection_method = "ai_selection"
         
-        # Step 4: Search philosophy content across selected books
+        # Step 4: Search philosophy content within each selected book's partition
+        # (MMR keeps the 2 passages per book that end up in the prompt from repeating each other)
         philosophy_sources = []
+        book_query = f"{text} {primary_emotion}"
         for book in preferred_books:
-            book_query = f"{text} {primary_emotion} {book}"
-            book_sources = self.philosophy_rag.search_relevant_content(book_query, top_k=3)
+            book_sources = self.philosophy_rag.search_relevant_content(
+                book_query, top_k=2, books=[book], context=context, mmr=True, emotion=primary_emotion
+            )
             philosophy_sources.extend(book_sources)
         
-        # Step 5: Generate therapeutic response
-        therapeutic_response = self.generate_therapeutic_response(
-            text, primary_emotion, philosophy_sources
-        )
+        return {
+            "primary_emotion": primary_emotion,
+            "learned_prefs": learned_prefs,
+            "complexity_analysis": complexity_analysis,
+            "preferred_books": preferred_books,
+            "book_selection_method": book_selection_method,
+            "philosophy_sources": philosophy_sources
+        }
+    
+    def complete_session(self, text: str, user_id: str, emotion_result: Dict, plan: Dict,
+                         therapeutic_response: str, context: EmbeddingContext) -> Dict:
+        """Steps 6-9: play music, log the session, update learning and assemble the result"""
+        primary_emotion = plan['primary_emotion']
+        learned_prefs = plan['learned_prefs']
+        preferred_books = plan['preferred_books']
         
         # Step 6: Select music using learned preferences
         if learned_prefs['preferred_playlists']:
             playlist_name = learned_prefs['preferred_playlists'][0][0]
             music_selection_method = "learned_preferences"
         else:
-            playlist_result = self.intelligent_selector.select_optimal_playlist(primary_emotion, text)
+            playlist_result = self.intelligent_selector.select_optimal_playlist(primary_emotion, text, context=context)
             playlist_name = playlist_result['playlist']
             music_selection_method = "ai_selection"
         
         # Step 7: Play music
-        music_result = play_music_for_emotion(text, primary_emotion)
-        
-        # Step 8: Log interaction for future learning
-        log_emotion_session(
-            user_input=text,
-            detected_emotion=primary_emotion,
-            selected_book=preferred_books[0] if preferred_books else 'none',
-            music_playlist=playlist_name,
-            music_status=music_result.get('status', 'unknown'),
-            session_id=user_id
-        )
-        
-        # Step 9: Update learning patterns (reinforcement)
-        self.learning_engine.update_learning_from_new_interaction(
-            text, primary_emotion, preferred_books[0] if preferred_books else 'none', playlist_name
-        )
+        music_result = play_music_for_emotion(text, primary_emotion, context=context)
+        
+        with self._session_lock:
+            # Step 8: Log interaction for future learning
+            log_emotion_session(
+                user_input=text,
+                detected_emotion=primary_emotion,
+                selected_book=preferred_books[0] if preferred_books else 'none',
+                music_playlist=playlist_name,
+                music_status=music_result.get('status', 'unknown'),
+                session_id=user_id,
+                classification_method=emotion_result.get('method', 'unknown')
+            )
+            
+            # Step 9: Update learning patterns (reinforcement)
+            self.learning_engine.update_learning_from_new_interaction(
+                text, primary_emotion, preferred_books[0] if preferred_books else 'none', playlist_name
+            )
         
         return {
             "status": "success",
@@ -107,8 +168,8 @@ class JARVISCoreEngine:
             "philosophy": {
                 "response": therapeutic_response,
                 "books_referenced": preferred_books,
-                "sources_count": len(philosophy_sources),
-                "selection_method": book_selection_method
+                "sources_count": len(plan['philosophy_sources']),
+                "selection_method": plan['book_selection_method']
             },
             "music": {
                 "playlist": playlist_name,
@@ -118,16 +179,20 @@ class JARVISCoreEngine:
             },
             "learning": {
                 "learning_confidence": learned_prefs['learning_confidence'],
-                "complexity_score": complexity_analysis['complexity_score'],
+                "complexity_score": plan['complexity_analysis']['complexity_score'],
                 "method_used": emotion_result.get('method', 'hybrid')
-            }
+            },
+            "embedding": {**context.stats(), "cache": embedding_cache.stats()},
+            "retrieval": self.philosophy_rag.candidate_tables.stats()
         }
     
-    def generate_therapeutic_response(self, text: str, emotion: str, sources: List[Dict]) -> str:
-        """Generate therapeutic response using philosophy sources"""
-        
+    def response_fallback(self, emotion: str, sources: List[Dict]) -> str:
         if not sources:
             return f"I understand you're feeling {emotion}. While I don't have specific philosophical guidance for your exact situation, your emotions are valid and seeking support shows wisdom."
+        return f"I understand you're experiencing {emotion}. The wisdom traditions offer guidance, though I'm having difficulty accessing specific quotes right now. Your feelings are valid and seeking wisdom shows strength."
+    
+    def create_therapeutic_prompt(self, text: str, emotion: str, sources: List[Dict]) -> str:
+        """Prompt weaving the retrieved passages, grouped by book, into the response request"""
         
         # Group sources by book for attribution
         sources_by_book = defaultdict(list)
@@ -143,7 +208,7 @@ class JARVISCoreEngine:
         
         books_used = list(sources_by_book.keys())
         
-        prompt = f"""You are a wise counselor integrating ancient philosophy with modern understanding.
+        return f"""You are a wise counselor integrating ancient philosophy with modern understanding.
 
 A person feeling "{emotion}" shared: "{text}"
 
@@ -160,21 +225,31 @@ Create a compassionate response that:
 Books referenced: {', '.join(books_used)}
 
 Response:"""
-
-        try:
-            response = requests.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-                timeout=OLLAMA_TIMEOUT
+    
+    def generate_therapeutic_response(self, text: str, emotion: str, sources: List[Dict]) -> str:
+        """Generate therapeutic response using philosophy sources"""
+        if not sources:
+            return self.response_fallback(emotion, sources)
+        return ollama_client.generate(
+            self.create_therapeutic_prompt(text, emotion, sources),
+            call_site="core_response",
+            fallback=self.response_fallback(emotion, sources)
+        )
+    
+    async def agenerate_therapeutic_response(self, text: str, emotion: str, sources: List[Dict],
+                                             on_token: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        if not sources:
+            return self.response_fallback(emotion, sources)
+        prompt = self.create_therapeutic_prompt(text, emotion, sources)
+        if on_token is not None:
+            return await ollama_client.agenerate_stream(
+                prompt, on_token, call_site="core_response", fallback=self.response_fallback(emotion, sources)
             )
-            
-            if response.ok:
-                return response.json().get("response", "").strip()
-            
-        except Exception as e:
-            print(f"❌ Response generation failed: {e}")
-        
-        return f"I understand you're experiencing {emotion}. The wisdom traditions offer guidance, though I'm having difficulty accessing specific quotes right now. Your feelings are valid and seeking wisdom shows strength."
+        return await ollama_client.agenerate(
+            prompt,
+            call_site="core_response",
+            fallback=self.response_fallback(emotion, sources)
+        )
 
 # Global instance
 jarvis_core = JARVISCoreEngine()
\ No newline at end of file
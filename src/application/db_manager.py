@@ -6,15 +6,32 @@ from datetime import datetime
 from pathlib import Path
 from src.commonconst import CSV_EXPORT_PATH
 
+CSV_COLUMNS = [
+    'Timestamp', 'User Input', 'Detected Emotion', 'Philosophy Book',
+    'Music Playlist', 'Music Status', 'Session ID', 'Classification Method'
+]
+
 def ensure_csv_exists():
-    """Ensure the CSV file exists with proper headers"""
+    """Ensure the CSV file exists with proper headers, adding columns missing from older logs"""
     if not CSV_EXPORT_PATH.exists():
         with open(CSV_EXPORT_PATH, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow([
-                'Timestamp', 'User Input', 'Detected Emotion', 'Philosophy Book',
-                'Music Playlist', 'Music Status', 'Session ID'
-            ])
+            writer.writerow(CSV_COLUMNS)
+        return
+    
+    with open(CSV_EXPORT_PATH, 'r', newline='', encoding='utf-8') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    if header[:len(CSV_COLUMNS)] == CSV_COLUMNS:
+        return
+    
+    # Older logs lack the classification method; rewrite once with it left blank
+    with open(CSV_EXPORT_PATH, 'r', newline='', encoding='utf-8') as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    with open(CSV_EXPORT_PATH, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"📊 Added missing columns to {CSV_EXPORT_PATH.name}")
 
 def log_emotion_session(
     user_input: str,
@@ -24,7 +41,8 @@ def log_emotion_session(
     music_playlist: str = "none",
     music_device: str = "none",
     music_status: str = "none",
-    session_id: str = "default"
+    session_id: str = "default",
+    classification_method: str = "unknown"
 ):
     """Log emotion session directly to CSV file"""
     ensure_csv_exists()
@@ -39,7 +57,8 @@ def log_emotion_session(
             selected_book,
             music_playlist,
             music_status,
-            session_id
+            session_id,
+            classification_method
         ])
     
     print(f"📊 Logged to CSV: {detected_emotion} emotion from {session_id}")
@@ -1,9 +1,7 @@
 # src/application/emotion_engine.py - Advanced Emotion Analysis with Psychological Insights
 
-import requests
-import json
 from typing import Dict, Tuple
-from src.commonconst import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT
+from src.application.ollama_client import ollama_client
 from src.modeling.simple_emotion_model import simple_emotion_classifier
 
 def analyze_emotion_with_psychology(text: str) -> Dict:
@@ -55,32 +53,8 @@ Focus on:
 
 Respond ONLY with valid JSON, no additional text."""
 
-    try:
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-            timeout=OLLAMA_TIMEOUT
-        )
-        
-        if response.ok:
-            raw_response = response.json().get("response", "").strip()
-            
-            # Extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-            if json_match:
-                try:
-                    psychological_data = json.loads(json_match.group(0))
-                    return psychological_data
-                except json.JSONDecodeError:
-                    pass
-        
-        # Fallback if JSON parsing fails
-        return create_fallback_analysis(detected_emotion)
-        
-    except Exception as e:
-        print(f"❌ Psychological analysis failed: {e}")
-        return create_fallback_analysis(detected_emotion)
+    psychological_data = ollama_client.generate_json(prompt, call_site="psychological_analysis", cache=True)
+    return psychological_data if psychological_data is not None else create_fallback_analysis(detected_emotion)
 
 def create_fallback_analysis(emotion: str) -> Dict:
     """Create fallback psychological analysis"""
@@ -0,0 +1,177 @@
+# src/application/llm_cache.py - Prompt-level Cache for Ollama Responses
+
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+from src.commonconst import (
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_SEMANTIC_THRESHOLD
+)
+
+class LLMCache:
+    """SQLite cache of LLM completions keyed by model + prompt hash, with TTL and LRU eviction
+    
+    Only deterministic call sites (classification, psychological analysis) should use
+    it. The optional semantic tier maps a message embedding to a previous result for
+    the same call site, so a near-identical message reuses its classification even
+    though the prompt differs. Its vectors are kept in memory, backed by the same
+    database.
+    """
+    
+    def __init__(self, path: Path = LLM_CACHE_PATH, ttl: int = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, semantic_threshold: float = LLM_CACHE_SEMANTIC_THRESHOLD):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        
+        self._lock = threading.Lock()
+        self._connection = None
+        # call site -> (row ids, unit vectors, created timestamps)
+        self._semantic: Dict[str, tuple] = {}
+        self.call_stats: Dict[str, Dict[str, int]] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+    
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.enabled and self.semantic_threshold > 0
+    
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY, call_site TEXT, response TEXT, created REAL, last_used REAL
+                );
+                CREATE TABLE IF NOT EXISTS semantic (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, call_site TEXT, embedding BLOB, response TEXT, created REAL
+                );
+            """)
+        return self._connection
+    
+    def _count(self, call_site: str, outcome: str):
+        stats = self.call_stats.setdefault(call_site, {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+        stats[outcome] += 1
+    
+    def get(self, model: str, prompt: str, call_site: str) -> Optional[str]:
+        """Cached completion for this exact prompt, or None (counted as a miss)"""
+        if not self.enabled:
+            return None
+        key = self.make_key(model, prompt)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                connection.commit()
+                self._count(call_site, "exact_hits")
+                return row[0]
+            self._count(call_site, "misses")
+            return None
+    
+    def put(self, model: str, prompt: str, call_site: str, response: str):
+        """Store a completion, dropping expired rows and the least recently used beyond max_entries"""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, call_site, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self.make_key(model, prompt), call_site, response, now, now)
+            )
+            connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            connection.execute(
+                "DELETE FROM responses WHERE key NOT IN (SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            connection.commit()
+    
+    def _semantic_entries(self, call_site: str) -> tuple:
+        if call_site not in self._semantic:
+            rows = self._connect().execute(
+                "SELECT id, embedding, created FROM semantic WHERE call_site = ? AND created >= ? ORDER BY id",
+                (call_site, time.time() - self.ttl)
+            ).fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            created = np.array([row[2] for row in rows], dtype=np.float64)
+            self._semantic[call_site] = (ids, vectors, created)
+        return self._semantic[call_site]
+    
+    def get_semantic(self, call_site: str, embedding: np.ndarray) -> Optional[str]:
+        """Response cached for the most similar earlier message, if it clears the threshold"""
+        if not self.semantic_enabled:
+            return None
+        with self._lock:
+            ids, vectors, created = self._semantic_entries(call_site)
+            if vectors is not None:
+                similarities = vectors @ np.asarray(embedding, dtype=np.float32)
+                similarities[created < time.time() - self.ttl] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.semantic_threshold:
+                    row = self._connect().execute("SELECT response FROM semantic WHERE id = ?", (int(ids[best]),)).fetchone()
+                    if row is not None:
+                        self._count(call_site, "semantic_hits")
+                        return row[0]
+            return None
+    
+    def put_semantic(self, call_site: str, embedding: np.ndarray, response: str):
+        if not self.semantic_enabled:
+            return
+        embedding = np.asarray(embedding, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            # Load before inserting, or the new row would be read back and then appended again
+            ids, vectors, created = self._semantic_entries(call_site)
+            cursor = connection.execute(
+                "INSERT INTO semantic (call_site, embedding, response, created) VALUES (?, ?, ?, ?)",
+                (call_site, embedding.tobytes(), response, now)
+            )
+            connection.execute("DELETE FROM semantic WHERE created < ?", (now - self.ttl,))
+            connection.execute(
+                "DELETE FROM semantic WHERE call_site = ? AND id NOT IN "
+                "(SELECT id FROM semantic WHERE call_site = ? ORDER BY id DESC LIMIT ?)",
+                (call_site, call_site, self.max_entries)
+            )
+            connection.commit()
+            
+            ids = np.append(ids, cursor.lastrowid)[-self.max_entries:]
+            vectors = (embedding[None, :] if vectors is None else np.vstack([vectors, embedding]))[-self.max_entries:]
+            created = np.append(created, now)[-self.max_entries:]
+            self._semantic[call_site] = (ids, vectors, created)
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Exact and semantic hit rates per call site"""
+        with self._lock:
+            report = {}
+            for call_site, stats in self.call_stats.items():
+                hits = stats["exact_hits"] + stats["semantic_hits"]
+                lookups = hits + stats["misses"]
+                report[call_site] = {**stats, "hit_rate": hits / lookups if lookups else 0.0}
+            return report
+    
+    def overall_hit_rate(self) -> float:
+        with self._lock:
+            hits = sum(stats["exact_hits"] + stats["semantic_hits"] for stats in self.call_stats.values())
+            lookups = hits + sum(stats["misses"] for stats in self.call_stats.values())
+            return hits / lookups if lookups else 0.0
+
+# Global instance
+llm_cache = LLMCache()
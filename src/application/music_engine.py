@@ -1,7 +1,6 @@
 # src/application/music_engine.py - Music Selection and Playback
 
-from typing import Dict
-from sentence_transformers import util
+from typing import Dict, Optional
 from spotipy import Spotify
 from spotipy.oauth2 import SpotifyOAuth
 from src.commonconst import (
@@ -9,10 +8,10 @@ from src.commonconst import (
     SPOTIPY_CLIENT_SECRET, 
     SPOTIPY_REDIRECT_URI,
     SPOTIFY_SCOPE,
-    SPOTIFY_PLAYLISTS,
-    EMBEDDING_MODEL
+    SPOTIFY_PLAYLISTS
 )
 from src.modeling.intelligent_selector import intelligent_selector
+from src.vector_space.embedding_context import EmbeddingContext
 
 def get_spotify_client() -> Spotify:
     """Initialize Spotify client"""
@@ -29,9 +28,10 @@ def is_spotify_configured() -> bool:
                 SPOTIPY_CLIENT_ID != "your_spotify_client_id" and 
                 SPOTIPY_CLIENT_SECRET != "your_spotify_client_secret")
 
-def match_emotion_to_playlist(emotion: str, emotional_context: str = "") -> Dict:
+def match_emotion_to_playlist(emotion: str, emotional_context: str = "",
+                              context: Optional[EmbeddingContext] = None) -> Dict:
     """Use ML model to intelligently select playlist"""
-    return intelligent_selector.select_optimal_playlist(emotion, emotional_context)
+    return intelligent_selector.select_optimal_playlist(emotion, emotional_context, context=context)
 
 def play_playlist(playlist_id: str) -> dict:
     """Play a playlist on Spotify"""
@@ -85,10 +85,10 @@ def play_playlist(playlist_id: str) -> dict:
                 "message": f"❌ Spotify error: {error_msg}"
             }
 
-def play_music_for_emotion(text: str, emotion: str) -> dict:
+def play_music_for_emotion(text: str, emotion: str, context: Optional[EmbeddingContext] = None) -> dict:
     """Main function: match emotion to music and play"""
-    # Use intelligent selector for playlist
-    selection_result = match_emotion_to_playlist(emotion, text)
+    # Use intelligent selector for playlist (reuses the request's earlier selection)
+    selection_result = match_emotion_to_playlist(emotion, text, context)
     playlist_name = selection_result["playlist"]
     playlist_confidence = selection_result["confidence"]
     playlist_id = SPOTIFY_PLAYLISTS.get(playlist_name)
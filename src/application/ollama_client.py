@@ -0,0 +1,251 @@
+# src/application/ollama_client.py - Shared Pooled Ollama Client
+
+import asyncio
+import json
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from src.commonconst import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT, OLLAMA_POOL_SIZE
+from src.application.llm_cache import llm_cache
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+JSON_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+
+def extract_json(text: str) -> Optional[Dict]:
+    """First {...} block in an LLM reply parsed as JSON (models like to add prose around it)"""
+    match = JSON_PATTERN.search(text or "")
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+class OllamaClient:
+    """One keep-alive HTTP session for every call to Ollama's /api/generate
+    
+    Connections are pooled per process, so concurrent requests reuse open sockets
+    instead of paying TCP setup each time. Every call names its call site, has its
+    own deadline and returns the caller's fallback on any failure, so call sites no
+    longer need their own try/except.
+    
+    The async methods share a pooled httpx.AsyncClient (one per event loop), so
+    waiting on Ollama never blocks the loop other conversations run on.
+    """
+    
+    connect_timeout = 5
+    
+    def __init__(self, base_url: str = OLLAMA_URL, model: str = OLLAMA_MODEL,
+                 timeout: float = OLLAMA_TIMEOUT, pool_size: int = OLLAMA_POOL_SIZE):
+        self.base_url = (base_url or "").rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.pool_size = pool_size
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        self._stats_lock = threading.Lock()
+        self.call_stats: Dict[str, Dict] = {}
+        
+        self._async_client = None
+        self._async_loop = None
+        self._warned_sync_fallback = False
+    
+    def _payload(self, prompt: str, stream: bool = False) -> Dict:
+        return {"model": self.model, "prompt": prompt, "stream": stream}
+    
+    def _record(self, call_site: str, started: float, ok: bool, first_token: Optional[float] = None):
+        with self._stats_lock:
+            stats = self.call_stats.setdefault(
+                call_site, {"calls": 0, "failures": 0, "seconds": 0.0, "streams": 0, "first_token_seconds": 0.0}
+            )
+            stats["calls"] += 1
+            stats["seconds"] += time.perf_counter() - started
+            if not ok:
+                stats["failures"] += 1
+            if first_token is not None:
+                stats["streams"] += 1
+                stats["first_token_seconds"] += first_token - started
+    
+    def generate(self, prompt: str, call_site: str = "generate", timeout: Optional[float] = None,
+                 fallback: Any = None) -> Any:
+        """Completion text for a prompt, or `fallback` if Ollama fails or misses the deadline"""
+        deadline = timeout or self.timeout
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json=self._payload(prompt),
+                timeout=(min(self.connect_timeout, deadline), deadline)
+            )
+            if response.ok:
+                text = response.json().get("response", "").strip()
+                self._record(call_site, started, True)
+                return text
+            print(f"❌ {call_site} failed: Ollama returned HTTP {response.status_code}")
+        except Exception as e:
+            print(f"❌ {call_site} failed: {e}")
+        
+        self._record(call_site, started, False)
+        return fallback
+    
+    def generate_json(self, prompt: str, call_site: str = "generate_json", timeout: Optional[float] = None,
+                      fallback: Any = None, cache: bool = False) -> Any:
+        """JSON object extracted from the completion, or `fallback` if there is none
+        
+        With `cache`, identical prompts are answered from the LLM cache; only replies
+        that parsed are stored.
+        """
+        cached = llm_cache.get(self.model, prompt, call_site) if cache else None
+        data = extract_json(cached if cached is not None else self.generate(prompt, call_site, timeout))
+        if cache and cached is None and data is not None:
+            llm_cache.put(self.model, prompt, call_site, json.dumps(data))
+        return data if data is not None else fallback
+    
+    async def _async_session(self):
+        """Pooled AsyncClient bound to the running event loop (a client left from another loop is closed)"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            previous = self._async_client
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+            self._async_loop = loop
+            if previous is not None:
+                await self._close_client(previous)
+        return self._async_client
+    
+    @staticmethod
+    async def _close_client(client):
+        try:
+            await client.aclose()
+        except RuntimeError:
+            # Its sockets belonged to an event loop that is already closed; the client is
+            # still marked closed and the transports are released with that loop
+            pass
+    
+    async def agenerate(self, prompt: str, call_site: str = "generate", timeout: Optional[float] = None,
+                        fallback: Any = None) -> Any:
+        """Non-blocking generate(); the deadline bounds the whole call, not each socket read"""
+        if httpx is None:
+            if not self._warned_sync_fallback:
+                print("📦 httpx not installed, running Ollama calls in worker threads: pip install httpx")
+                self._warned_sync_fallback = True
+            return await asyncio.to_thread(self.generate, prompt, call_site, timeout, fallback)
+        
+        deadline = timeout or self.timeout
+        started = time.perf_counter()
+        try:
+            client = await self._async_session()
+            response = await asyncio.wait_for(
+                client.post(f"{self.base_url}/api/generate", json=self._payload(prompt), timeout=deadline),
+                deadline
+            )
+            if response.is_success:
+                text = response.json().get("response", "").strip()
+                self._record(call_site, started, True)
+                return text
+            print(f"❌ {call_site} failed: Ollama returned HTTP {response.status_code}")
+        except asyncio.TimeoutError:
+            print(f"❌ {call_site} failed: no response within {deadline}s")
+        except Exception as e:
+            print(f"❌ {call_site} failed: {e}")
+        
+        self._record(call_site, started, False)
+        return fallback
+    
+    async def agenerate_json(self, prompt: str, call_site: str = "generate_json", timeout: Optional[float] = None,
+                             fallback: Any = None, cache: bool = False) -> Any:
+        # SQLite cache I/O runs in a worker thread so it never blocks other chats
+        cached = await asyncio.to_thread(llm_cache.get, self.model, prompt, call_site) if cache else None
+        data = extract_json(cached if cached is not None else await self.agenerate(prompt, call_site, timeout))
+        if cache and cached is None and data is not None:
+            await asyncio.to_thread(llm_cache.put, self.model, prompt, call_site, json.dumps(data))
+        return data if data is not None else fallback
+    
+    async def astream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield response fragments as Ollama produces them (one NDJSON object per line)
+        
+        The deadline applies to each read, so a long answer that keeps streaming is
+        never cut off, but a stalled one is. Errors propagate to the caller.
+        """
+        deadline = timeout or self.timeout
+        client = await self._async_session()
+        async with client.stream(
+            "POST", f"{self.base_url}/api/generate", json=self._payload(prompt, stream=True), timeout=deadline
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+    
+    async def agenerate_stream(self, prompt: str, on_token: Callable[[str], Awaitable[None]],
+                               call_site: str = "generate", timeout: Optional[float] = None, fallback: Any = None) -> Any:
+        """agenerate() that awaits `on_token(text_so_far)` after every fragment
+        
+        Returns the complete text, or `fallback` if the stream fails before any
+        token arrives; a stream that breaks midway returns what was received.
+        """
+        if httpx is None:
+            text = await self.agenerate(prompt, call_site, timeout, fallback)
+            if text:
+                await on_token(text)
+            return text
+        
+        started = time.perf_counter()
+        first_token = None
+        text = ""
+        try:
+            async for fragment in self.astream(prompt, timeout):
+                if first_token is None:
+                    first_token = time.perf_counter()
+                text += fragment
+                await on_token(text)
+            self._record(call_site, started, True, first_token)
+            return text.strip()
+        except Exception as e:
+            print(f"❌ {call_site} stream failed: {e}")
+        
+        self._record(call_site, started, False, first_token)
+        return text.strip() or fallback
+    
+    async def aclose(self):
+        """Close the async client and its connection pool (call on shutdown)"""
+        if self._async_client is not None:
+            client, self._async_client, self._async_loop = self._async_client, None, None
+            await self._close_client(client)
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Calls, failures, average latency and (for streamed calls) time to first token per call site"""
+        with self._stats_lock:
+            return {
+                call_site: {
+                    "calls": stats["calls"],
+                    "failures": stats["failures"],
+                    "avg_ms": 1000 * stats["seconds"] / stats["calls"] if stats["calls"] else 0.0,
+                    "streams": stats["streams"],
+                    "avg_first_token_ms": 1000 * stats["first_token_seconds"] / stats["streams"] if stats["streams"] else 0.0
+                }
+                for call_site, stats in self.call_stats.items()
+            }
+
+# Global instance
+ollama_client = OllamaClient()
@@ -1,10 +1,10 @@
 # src/application/philosophy_engine.py - RAG-Enhanced Philosophy Response System
 
-import requests
 import json
 from typing import Dict, List
-from src.commonconst import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT
+from src.application.ollama_client import ollama_client
 from src.application.therapeutic_response import therapeutic_engine
+from src.vector_space.philosophy_rag import philosophy_rag
 
 def search_relevant_philosophy(text: str, emotion: str, top_k: int = 5) -> List[Dict]:
     """Search for most relevant philosophy content using RAG"""
@@ -100,21 +100,11 @@ def get_rag_philosophical_response(text: str, emotion: str) -> Dict:
     prompt = create_grounded_philosophy_prompt(text, emotion, relevant_content)
     
     # Step 3: Generate response using Ollama
-    try:
-        response = requests.post(
-            f"{OLLAMA_URL}/api/generate",
-            json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-            timeout=OLLAMA_TIMEOUT
-        )
-        
-        if response.ok:
-            philosophical_response = response.json().get("response", "").strip()
-        else:
-            philosophical_response = "I understand your feelings. The philosophy texts offer wisdom for reflection."
-            
-    except Exception as e:
-        print(f"❌ Philosophy response generation failed: {e}")
-        philosophical_response = "I understand your feelings. Take time to reflect on your emotions."
+    philosophical_response = ollama_client.generate(
+        prompt,
+        call_site="philosophy_response",
+        fallback="I understand your feelings. The philosophy texts offer wisdom for reflection."
+    )
     
     # Extract metadata
     books_used = list(set(content['book'] for content in relevant_content))
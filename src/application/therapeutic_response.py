@@ -1,9 +1,7 @@
 # src/application/therapeutic_response.py - Integrated Therapeutic Response System
 
-import requests
-import json
 from typing import Dict, List
-from src.commonconst import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT
+from src.application.ollama_client import ollama_client
 from src.application.psychology_prompts import psychology_prompts
 from src.vector_space.philosophy_rag import philosophy_rag
 
@@ -17,32 +15,8 @@ class TherapeuticResponseEngine:
     def generate_psychological_analysis(self, text: str) -> Dict:
         """Generate comprehensive psychological analysis"""
         prompt = self.psychology_prompts.create_emotion_analysis_prompt(text)
-        
-        try:
-            response = requests.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-                timeout=OLLAMA_TIMEOUT
-            )
-            
-            if response.ok:
-                raw_response = response.json().get("response", "").strip()
-                
-                # Extract JSON
-                import re
-                json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-                if json_match:
-                    try:
-                        return json.loads(json_match.group(0))
-                    except json.JSONDecodeError:
-                        pass
-            
-            # Fallback
-            return self.create_fallback_psychological_analysis(text)
-            
-        except Exception as e:
-            print(f"❌ Psychological analysis failed: {e}")
-            return self.create_fallback_psychological_analysis(text)
+        analysis = ollama_client.generate_json(prompt, call_site="therapeutic_analysis", cache=True)
+        return analysis if analysis is not None else self.create_fallback_psychological_analysis(text)
     
     def create_fallback_psychological_analysis(self, text: str) -> Dict:
         """Create fallback psychological analysis"""
@@ -85,22 +59,8 @@ class TherapeuticResponseEngine:
             f"philosophical support {emotion}"
         ]
         
-        all_results = []
-        seen_sources = set()
-        
-        for query in search_queries:
-            results = self.philosophy_rag.search_relevant_content(query, top_k=top_k//len(search_queries))
-            
-            for result in results:
-                # Avoid duplicate sources
-                source_key = f"{result['book']}_{result['source'][:50]}"
-                if source_key not in seen_sources:
-                    all_results.append(result)
-                    seen_sources.add(source_key)
-        
-        # Sort by relevance score and return top results
-        all_results.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return all_results[:top_k]
+        # One batched encode and scan; results come back deduplicated by document id and MMR-diversified
+        return self.philosophy_rag.search_many(search_queries, top_k=top_k, mmr=True)
     
     def generate_integrated_response(self, text: str, emotion: str) -> Dict:
         """Generate integrated therapeutic response combining psychology and philosophy"""
@@ -117,21 +77,11 @@ class TherapeuticResponseEngine:
                 text, psychological_analysis, philosophy_sources
             )
             
-            try:
-                response = requests.post(
-                    f"{OLLAMA_URL}/api/generate",
-                    json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-                    timeout=OLLAMA_TIMEOUT
-                )
-                
-                if response.ok:
-                    therapeutic_response = response.json().get("response", "").strip()
-                else:
-                    therapeutic_response = "I understand your feelings and am here to support you."
-                    
-            except Exception as e:
-                print(f"❌ Therapeutic response generation failed: {e}")
-                therapeutic_response = "I understand your feelings and am here to support you."
+            therapeutic_response = ollama_client.generate(
+                prompt,
+                call_site="therapeutic_response",
+                fallback="I understand your feelings and am here to support you."
+            )
         else:
             therapeutic_response = "I understand your feelings. While I couldn't find specific philosophical guidance for your situation, know that your emotions are valid and seeking support is a sign of strength."
         
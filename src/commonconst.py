@@ -1,9 +1,10 @@
 # src/commonconst.py - Clean Configuration
 
 import os
+import json
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 
 # Load environment variables
 load_dotenv()
@@ -21,13 +22,107 @@ CHAT_DB = DB_DIR / "chat_history.db"
 OLLAMA_URL = os.getenv("OLLAMA_URL")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
 OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "30"))
-EMBEDDING_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))  # keep-alive connections to Ollama
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch, int8 or onnx
+
+class LazyEmbeddingModel:
+    """Thread-safe handle that imports torch and loads the model on first use"""
+    
+    def __init__(self, model_name: str, backend: str = "torch"):
+        self.model_name = model_name
+        self.backend = backend
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+    
+    @property
+    def backend_name(self) -> str:
+        """Backend that loaded (or will load, if still lazy), which differs from `backend` after a fallback"""
+        if self._model is not None:
+            return self._model.name
+        from src.vector_space.embedding_backends import resolve_embedding_backend
+        return resolve_embedding_backend(self.backend)
+    
+    def load(self):
+        """Return the underlying model, loading it exactly once across threads"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from src.vector_space.embedding_backends import create_embedding_backend
+                    print(f"🧠 Loading embedding model {self.model_name} ({self.backend} backend)...")
+                    self._model = create_embedding_backend(self.backend, self.model_name)
+        return self._model
+    
+    def encode(self, sentences, **kwargs):
+        return self.load().encode(sentences, **kwargs)
+    
+    def __getattr__(self, name):
+        # Only reached for attributes not defined here, e.g. get_sentence_embedding_dimension
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+EMBEDDING_MODEL = LazyEmbeddingModel(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+
+def warm_up_embedding_model():
+    """Load the embedding model ahead of the first request"""
+    EMBEDDING_MODEL.load()
+
+# === Embedding Cache ===
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_PATH = DB_DIR / "embedding_cache.npy"
+
+# === LLM Response Cache ===
+LLM_CACHE_PATH = DB_DIR / "llm_cache.db"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "604800"))  # seconds; 0 disables the cache
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0"))  # cosine to reuse a classification, 0 disables
+
+# === Emotion Classification ===
+EMOTION_LLM_GATE = os.getenv("EMOTION_LLM_GATE", "gated")  # gated, always or never
+EMOTION_LLM_DEADLINE = float(os.getenv("EMOTION_LLM_DEADLINE", "8"))  # seconds before falling back to the semantic result
+EMOTION_GATE_MARGIN = float(os.getenv("EMOTION_GATE_MARGIN", "0"))  # top-1 vs top-2 margin used until calibrated, 0 always asks the LLM
+EMOTION_GATE_PATH = DB_DIR / "emotion_gate.json"
+
+# === Embedding Micro-batching ===
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+
+# === Philosophy Vector Index ===
+PHILOSOPHY_STORE_DIR = DB_DIR / "philosophy_store"
+RAG_BOOK_RELOAD_INTERVAL = float(os.getenv("RAG_BOOK_RELOAD_INTERVAL", "0"))  # seconds, 0 disables hot reload
+RAG_INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+RAG_ENCODE_BATCH_SIZE = int(os.getenv("RAG_ENCODE_BATCH_SIZE", "256"))
+RAG_INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "flat")  # brute, flat, ivf or hnsw
+RAG_IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "100"))
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "8"))
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "dense")  # dense or hybrid (dense + BM25; min scores then apply to the fused score)
+RAG_DENSE_WEIGHT = float(os.getenv("RAG_DENSE_WEIGHT", "1.0"))
+RAG_SPARSE_WEIGHT = float(os.getenv("RAG_SPARSE_WEIGHT", "0.3"))
+RAG_SPARSE_PREFILTER = int(os.getenv("RAG_SPARSE_PREFILTER", "0"))  # BM25 candidates for dense scoring, 0 disables
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))  # 1.0 = pure relevance, lower = more diverse
+RAG_MMR_POOL_FACTOR = int(os.getenv("RAG_MMR_POOL_FACTOR", "4"))  # MMR re-ranks top_k * factor candidates
+RAG_CANDIDATE_TABLE_SIZE = int(os.getenv("RAG_CANDIDATE_TABLE_SIZE", "64"))  # passages per emotion and book, 0 disables
+RAG_CANDIDATE_MIN_SCORE = float(os.getenv("RAG_CANDIDATE_MIN_SCORE", "0.4"))  # below this, fall back to the full index
+RAG_COMPRESSION = os.getenv("RAG_COMPRESSION", "none")  # none, pca or opq (projection before indexing)
+RAG_COMPRESSED_DIM = int(os.getenv("RAG_COMPRESSED_DIM", "128"))
+RAG_VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")  # float32, float16 or pq (product quantization)
+RAG_PQ_SUBQUANTIZERS = int(os.getenv("RAG_PQ_SUBQUANTIZERS", "16"))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.95"))  # cosine for near-duplicate passages, 0 disables
 
 # === Available Books ===
 AVAILABLE_BOOKS = ["analects", "iching", "mencius", "positive_psy", "social_psy", "tao_te_ching"]
 
 # === Telegram Bot ===
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_STREAM_RESPONSES = os.getenv("TELEGRAM_STREAM_RESPONSES", "true").lower() == "true"
+TELEGRAM_EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", "1.0"))  # seconds between edits of a streamed reply
 
 # === Spotify Configuration (Required for real music playback) ===
 SPOTIPY_CLIENT_ID = os.getenv("SPOTIPY_CLIENT_ID")
@@ -78,4 +173,15 @@ BOOK_PATHS = {
     "positive_psy": BOOK_DIR / "positive_psy.json",
     "social_psy": BOOK_DIR / "social_psy.json",
     "tao_te_ching": BOOK_DIR / "tao_te_ching.json",
-}
\ No newline at end of file
+}
+
+# === Extra Books (declared by mapping spec in book/book_parsers.json, no code change needed) ===
+BOOK_PARSER_SPECS_PATH = BOOK_DIR / "book_parsers.json"
+EXTRA_BOOK_SPECS = {}
+if BOOK_PARSER_SPECS_PATH.exists():
+    with open(BOOK_PARSER_SPECS_PATH, 'r', encoding='utf-8') as f:
+        EXTRA_BOOK_SPECS = json.load(f)
+    for book_name, book_spec in EXTRA_BOOK_SPECS.items():
+        BOOK_PATHS[book_name] = BOOK_DIR / book_spec["path"]
+        if book_name not in AVAILABLE_BOOKS:
+            AVAILABLE_BOOKS.append(book_name)
@@ -0,0 +1,115 @@
+# src/modeling/gate_calibration.py - Offline Calibration of the Emotion LLM Gate
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import csv
+import json
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from src.commonconst import CSV_EXPORT_PATH, EMOTION_GATE_PATH
+
+# Classification methods whose logged emotion came from the LLM
+LLM_METHODS = {"hybrid_llm"}
+
+def load_labeled_history(history_path: Path = CSV_EXPORT_PATH, limit: int = 0) -> List[Tuple[str, str]]:
+    """(user input, logged emotion) pairs from the session log, LLM-labelled sessions only
+    
+    Sessions where the gate skipped the LLM logged the semantic answer itself, and
+    rows from before the method was logged have no known source; both are left out.
+    """
+    if not history_path.exists():
+        return []
+    with open(history_path, 'r', newline='', encoding='utf-8') as csvfile:
+        rows = [
+            (row['User Input'], row['Detected Emotion'].strip().lower())
+            for row in csv.DictReader(csvfile)
+            if row.get('User Input') and row.get('Detected Emotion')
+            and row.get('Classification Method') in LLM_METHODS
+        ]
+    return rows[-limit:] if limit else rows
+
+def semantic_margins(classifier, texts: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Semantic top-1 emotion and top-1 vs top-2 margin for every text, in one batched encode"""
+    from src.vector_space.embedding_cache import embedding_cache
+    
+    emotion_names, profile_matrix = classifier.get_profile_matrix()
+    scores = embedding_cache.encode(texts) @ profile_matrix.T
+    top_two = np.sort(scores, axis=1)[:, -2:]
+    return [emotion_names[i] for i in np.argmax(scores, axis=1)], top_two[:, 1] - top_two[:, 0]
+
+def calibrate_threshold(margins: np.ndarray, agree: np.ndarray, target: float, min_support: int) -> Optional[float]:
+    """Lowest margin whose "margin >= threshold" slice agrees with the labels at least `target` of the time
+    
+    Returns None when no slice of at least `min_support` rows is accurate enough,
+    meaning the LLM should always be asked.
+    """
+    order = np.argsort(-margins)
+    precision = np.cumsum(agree[order]) / np.arange(1, len(order) + 1)
+    eligible = np.flatnonzero((precision >= target) & (np.arange(1, len(order) + 1) >= min_support))
+    if not len(eligible):
+        return None
+    return float(margins[order[eligible[-1]]])
+
+def calibrate(history_path: Path = CSV_EXPORT_PATH, target: float = 0.9, min_support: int = 20,
+              limit: int = 0) -> Dict:
+    """Global and per-emotion thresholds at which the semantic classifier matches logged emotions
+    
+    Only LLM-labelled sessions are used, so agreement with them estimates how
+    often skipping the LLM would change the answer. Emotions with fewer than
+    `min_support` rows use the global threshold.
+    """
+    from src.modeling.simple_emotion_model import simple_emotion_classifier
+    
+    history = load_labeled_history(history_path, limit)
+    if not history:
+        return {}
+    
+    predicted, margins = semantic_margins(simple_emotion_classifier, [text for text, _ in history])
+    agree = np.array([prediction == label for prediction, (_, label) in zip(predicted, history)], dtype=np.float64)
+    predicted = np.array(predicted)
+    
+    global_threshold = calibrate_threshold(margins, agree, target, min_support)
+    per_emotion = {}
+    for emotion in simple_emotion_classifier.emotion_profiles:
+        rows = predicted == emotion
+        if rows.sum() >= min_support:
+            per_emotion[emotion] = calibrate_threshold(margins[rows], agree[rows], target, min_support)
+    
+    thresholds = [per_emotion.get(emotion, global_threshold) for emotion in predicted]
+    thresholds = np.array([np.inf if threshold is None else threshold for threshold in thresholds])
+    skipped = margins >= thresholds
+    return {
+        "created_at": datetime.now().isoformat(),
+        "rows": len(history),
+        "target_agreement": target,
+        "min_support": min_support,
+        "global_threshold": global_threshold,
+        "per_emotion": per_emotion,
+        "expected_skip_rate": float(skipped.mean()),
+        "expected_agreement_when_skipped": float(agree[skipped].mean()) if skipped.any() else None,
+        "baseline_agreement": float(agree.mean())
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate when emotion classification may skip the LLM")
+    parser.add_argument("--target", type=float, default=0.9, help="Required agreement with logged emotions when skipping")
+    parser.add_argument("--min-support", type=int, default=20, help="Rows needed before a threshold is trusted")
+    parser.add_argument("--limit", type=int, default=0, help="Most recent history rows to use (0 = all)")
+    parser.add_argument("--output", type=Path, default=EMOTION_GATE_PATH)
+    args = parser.parse_args()
+    
+    gate = calibrate(target=args.target, min_support=args.min_support, limit=args.limit)
+    if not gate:
+        print(f"❌ No LLM-labelled history in {CSV_EXPORT_PATH}")
+        sys.exit(1)
+    
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(gate, f, indent=2)
+    print(f"✅ Gate written to {args.output}: global threshold {gate['global_threshold']}, "
+          f"{gate['expected_skip_rate']:.0%} of {gate['rows']} messages would skip the LLM")
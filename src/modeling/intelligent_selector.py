@@ -1,9 +1,11 @@
 # src/modeling/intelligent_selector.py - Model-driven Selection for Playlists and Books
 
 import numpy as np
-from typing import List, Dict, Tuple
-from sentence_transformers import util
+from typing import List, Dict, Optional, Tuple
 from src.commonconst import SPOTIFY_PLAYLISTS, AVAILABLE_BOOKS, EMBEDDING_MODEL
+from src.vector_space.embedding_utils import DescriptionIndex
+from src.vector_space.embedding_context import EmbeddingContext
+from src.vector_space.embedding_cache import embedding_cache
 
 class IntelligentSelector:
     """Model-driven selection system for playlists and philosophy books"""
@@ -27,25 +29,48 @@ class IntelligentSelector:
             "positive_psy": "happiness wellbeing strengths resilience optimism flourishing",
             "social_psy": "social behavior relationships groups influence psychology research"
         }
+        
+        # Candidate embeddings, re-encoded only when a description is added or changed
+        self.playlist_index = DescriptionIndex(self.embedding_model)
+        self.book_index = DescriptionIndex(self.embedding_model)
+    
+    def add_playlist(self, name: str, description: str):
+        """Register a playlist at runtime (only its description is encoded)"""
+        self.playlist_descriptions[name] = description
+        self.playlist_index.sync(self.playlist_descriptions)
     
-    def select_optimal_playlist(self, emotion: str, emotional_context: str = "") -> str:
+    def add_book(self, name: str, description: str):
+        """Register a philosophy book at runtime (only its description is encoded)"""
+        self.book_descriptions[name] = description
+        self.book_index.sync(self.book_descriptions)
+    
+    def select_optimal_playlist(self, emotion: str, emotional_context: str = "",
+                                context: Optional[EmbeddingContext] = None) -> Dict:
         """Use semantic similarity to select the most appropriate playlist"""
+        if context is not None:
+            # Later stages of the same request reuse the first selection
+            return context.get_or_compute(
+                ("playlist", emotion, emotional_context),
+                lambda: self._match_playlist(emotion, emotional_context, context)
+            )
+        return self._match_playlist(emotion, emotional_context, EmbeddingContext(embedding_cache))
+    
+    def _match_playlist(self, emotion: str, emotional_context: str, context: EmbeddingContext) -> Dict:
+        """Score the query against every cached playlist embedding"""
         # Combine emotion with context for better matching
         query = f"{emotion} {emotional_context}".strip()
         
         # Create embeddings
-        query_embedding = self.embedding_model.encode([query])
+        query_embedding = context.encode(query)
         
-        # Get playlist embeddings
-        playlist_names = list(self.playlist_descriptions.keys())
-        playlist_descriptions = [self.playlist_descriptions[name] for name in playlist_names]
-        playlist_embeddings = self.embedding_model.encode(playlist_descriptions)
+        # Get cached playlist embeddings
+        playlist_names, playlist_embeddings = self.playlist_index.sync(self.playlist_descriptions)
         
         # Calculate similarities
-        similarities = util.cos_sim(query_embedding, playlist_embeddings)[0]
+        similarities = playlist_embeddings @ query_embedding
         
         # Get best match
-        best_idx = similarities.argmax().item()
+        best_idx = int(similarities.argmax())
         best_score = float(similarities[best_idx])
         
         return {
@@ -54,24 +79,23 @@ class IntelligentSelector:
             "reasoning": f"Selected based on semantic match with {emotion} emotion"
         }
     
-    def select_relevant_books(self, emotion: str, emotional_context: str = "", top_k: int = 3) -> List[Dict]:
+    def select_relevant_books(self, emotion: str, emotional_context: str = "", top_k: int = 3,
+                              context: Optional[EmbeddingContext] = None) -> List[Dict]:
         """Select multiple relevant philosophy books for comprehensive response"""
         # Create comprehensive query
         query = f"{emotion} emotional guidance wisdom advice {emotional_context}".strip()
         
         # Create embeddings
-        query_embedding = self.embedding_model.encode([query])
+        query_embedding = (context or EmbeddingContext(embedding_cache)).encode(query)
         
-        # Get book embeddings
-        book_names = list(self.book_descriptions.keys())
-        book_descriptions = [self.book_descriptions[name] for name in book_names]
-        book_embeddings = self.embedding_model.encode(book_descriptions)
+        # Get cached book embeddings
+        book_names, book_embeddings = self.book_index.sync(self.book_descriptions)
         
         # Calculate similarities
-        similarities = util.cos_sim(query_embedding, book_embeddings)[0]
+        similarities = book_embeddings @ query_embedding
         
         # Get top matches
-        top_indices = similarities.topk(min(top_k, len(similarities))).indices.tolist()
+        top_indices = np.argsort(-similarities)[:top_k].tolist()
         
         selected_books = []
         for idx in top_indices:
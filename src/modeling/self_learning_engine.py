@@ -5,7 +5,6 @@ import numpy as np
 from typing import Dict, List, Tuple
 from collections import defaultdict
 from datetime import datetime, timedelta
-from sentence_transformers import util
 import pickle
 from src.commonconst import CSV_EXPORT_PATH, DB_DIR, EMBEDDING_MODEL
 
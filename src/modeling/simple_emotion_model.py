@@ -1,9 +1,23 @@
 # src/modeling/simple_emotion_model.py - Robust Emotion Classification
 
-import requests
-from typing import Dict, List, Tuple
-from sentence_transformers import util
-from src.commonconst import OLLAMA_URL, OLLAMA_MODEL, OLLAMA_TIMEOUT, EMBEDDING_MODEL
+import asyncio
+import json
+import os
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.commonconst import (
+    EMBEDDING_MODEL,
+    EMOTION_LLM_GATE,
+    EMOTION_LLM_DEADLINE,
+    EMOTION_GATE_MARGIN,
+    EMOTION_GATE_PATH
+)
+from src.application.ollama_client import ollama_client
+from src.application.llm_cache import llm_cache
+from src.vector_space.embedding_utils import l2_normalize
+from src.vector_space.embedding_context import EmbeddingContext
+from src.vector_space.embedding_cache import embedding_cache
 
 class SimpleEmotionClassifier:
     """Simple but effective emotion classifier using semantic similarity and LLM"""
@@ -54,22 +68,53 @@ class SimpleEmotionClassifier:
                 'psychological_markers': ['social_isolation', 'disconnection', 'lack_of_belonging', 'social_needs']
             }
         }
+        
+        # Normalized profile embeddings, rebuilt only when emotion_profiles changes
+        self._profile_names: List[str] = []
+        self._profile_texts: Tuple[str, ...] = ()
+        self._profile_matrix = None
+        
+        # Margin thresholds from gate_calibration, reloaded when the file changes
+        self._gate: Dict = {}
+        self._gate_mtime = None
+        self._gate_lock = threading.Lock()
+        self.gate_counts = {"skipped": 0, "llm": 0, "llm_failed": 0}
     
-    def classify_emotion_semantic(self, text: str) -> Dict:
-        """Classify emotion using semantic similarity"""
-        text_embedding = self.embedding_model.encode([text])
+    def get_profile_texts(self) -> Dict[str, str]:
+        """Return the text each emotion profile is embedded from"""
+        return {
+            emotion: f"{' '.join(profile['keywords'])} {profile['description']} {' '.join(profile['psychological_markers'])}"
+            for emotion, profile in self.emotion_profiles.items()
+        }
+    
+    def get_profile_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """Return emotion names and their normalized description embeddings (one row per emotion)"""
+        profile_texts = self.get_profile_texts()
+        names = list(profile_texts.keys())
+        texts = tuple(profile_texts.values())
         
-        emotion_scores = {}
+        if self._profile_matrix is None or names != self._profile_names or texts != self._profile_texts:
+            self._profile_matrix = l2_normalize(self.embedding_model.encode(list(texts)))
+            self._profile_names = names
+            self._profile_texts = texts
         
-        for emotion, profile in self.emotion_profiles.items():
-            # Create comprehensive emotion description
-            emotion_description = f"{' '.join(profile['keywords'])} {profile['description']} {' '.join(profile['psychological_markers'])}"
-            
-            # Calculate similarity
-            emotion_embedding = self.embedding_model.encode([emotion_description])
-            similarity = util.cos_sim(text_embedding, emotion_embedding)[0][0].item()
-            
-            emotion_scores[emotion] = similarity
+        return self._profile_names, self._profile_matrix
+    
+    @staticmethod
+    def message_embedding(text: str, context: Optional[EmbeddingContext] = None,
+                          embedding: Optional[np.ndarray] = None) -> np.ndarray:
+        """The message vector, unless the caller already encoded it"""
+        return embedding if embedding is not None else (context or EmbeddingContext(embedding_cache)).encode(text)
+    
+    def classify_emotion_semantic(self, text: str, context: Optional[EmbeddingContext] = None,
+                                  embedding: Optional[np.ndarray] = None) -> Dict:
+        """Classify emotion using semantic similarity"""
+        emotion_names, profile_matrix = self.get_profile_matrix()
+        text_embedding = self.message_embedding(text, context, embedding)
+        
+        # One matrix-vector product scores every emotion profile
+        similarities = profile_matrix @ text_embedding
+        emotion_scores = {emotion: float(score) for emotion, score in zip(emotion_names, similarities)}
         
         # Get top emotions
         sorted_emotions = sorted(emotion_scores.items(), key=lambda x: x[1], reverse=True)
@@ -80,17 +125,59 @@ class SimpleEmotionClassifier:
         return {
             'primary_emotion': primary_emotion,
             'confidence': confidence,
+            'margin': confidence - sorted_emotions[1][1] if len(sorted_emotions) > 1 else confidence,
             'top_emotions': sorted_emotions[:3],
             'all_scores': emotion_scores
         }
     
-    def classify_emotion_llm(self, text: str) -> Dict:
-        """Use LLM for sophisticated emotion classification"""
+    def gate_threshold(self, emotion: str) -> Optional[float]:
+        """Margin above which the semantic result is trusted without the LLM (None = always ask)"""
+        try:
+            mtime = os.stat(EMOTION_GATE_PATH).st_mtime
+        except OSError:
+            mtime = None
         
-        emotion_list = list(self.emotion_profiles.keys())
+        with self._gate_lock:
+            if mtime != self._gate_mtime:
+                self._gate_mtime = mtime
+                self._gate = {}
+                if mtime is not None:
+                    try:
+                        with open(EMOTION_GATE_PATH, 'r', encoding='utf-8') as f:
+                            self._gate = json.load(f)
+                        print(f"🚦 Loaded emotion gate thresholds (global {self._gate.get('global_threshold')})")
+                    except (OSError, ValueError) as e:
+                        print(f"❌ Could not load emotion gate: {e}")
+            gate = self._gate
+        
+        if not gate:
+            # Uncalibrated: skip nothing unless a margin was set explicitly
+            return EMOTION_GATE_MARGIN if EMOTION_GATE_MARGIN > 0 else None
+        return gate.get("per_emotion", {}).get(emotion, gate.get("global_threshold"))
+    
+    def skip_llm(self, semantic_result: Dict) -> bool:
+        """Gate decision for one message: True when the semantic margin clears the calibrated threshold"""
+        if EMOTION_LLM_GATE == "never":
+            return True
+        if EMOTION_LLM_GATE == "always":
+            return False
+        threshold = self.gate_threshold(semantic_result['primary_emotion'])
+        return threshold is not None and semantic_result['margin'] >= threshold
+    
+    def _count_gate(self, outcome: str):
+        with self._gate_lock:
+            self.gate_counts[outcome] += 1
+    
+    def gate_stats(self) -> Dict:
+        with self._gate_lock:
+            total = sum(self.gate_counts.values())
+            return {**self.gate_counts, "skip_rate": self.gate_counts["skipped"] / total if total else 0.0}
+    
+    def create_classification_prompt(self, text: str) -> str:
+        """Prompt asking the LLM for a JSON emotion classification"""
         emotion_descriptions = {k: v['description'] for k, v in self.emotion_profiles.items()}
         
-        prompt = f"""You are a clinical psychologist specializing in emotion classification.
+        return f"""You are a clinical psychologist specializing in emotion classification.
 
 Analyze this emotional expression: "{text}"
 
@@ -110,42 +197,100 @@ Provide a detailed analysis in JSON format:
 }}
 
 Focus on psychological accuracy and nuance. Respond ONLY with valid JSON."""
-
-        try:
-            response = requests.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={"model": OLLAMA_MODEL, "prompt": prompt, "stream": False},
-                timeout=OLLAMA_TIMEOUT
+    
+    def cached_classification(self, text: str, context: Optional[EmbeddingContext] = None,
+                              embedding: Optional[np.ndarray] = None) -> Optional[Dict]:
+        """LLM classification of a near-identical earlier message (semantic cache tier), if any"""
+        if not llm_cache.semantic_enabled:
+            return None
+        cached = llm_cache.get_semantic("classify_emotion", self.message_embedding(text, context, embedding))
+        return json.loads(cached) if cached is not None else None
+    
+    def remember_classification(self, text: str, llm_result: Optional[Dict], context: Optional[EmbeddingContext] = None,
+                                embedding: Optional[np.ndarray] = None):
+        if llm_result is not None and llm_cache.semantic_enabled:
+            llm_cache.put_semantic(
+                "classify_emotion", self.message_embedding(text, context, embedding), json.dumps(llm_result)
             )
-            
-            if response.ok:
-                raw_response = response.json().get("response", "").strip()
-                
-                # Extract JSON
-                import re
-                json_match = re.search(r'\{.*\}', raw_response, re.DOTALL)
-                if json_match:
-                    try:
-                        import json
-                        return json.loads(json_match.group(0))
-                    except json.JSONDecodeError:
-                        pass
-            
-            # Fallback to semantic classification
-            return self.classify_emotion_semantic(text)
-            
-        except Exception as e:
-            print(f"❌ LLM classification failed: {e}")
-            return self.classify_emotion_semantic(text)
     
-    def classify_emotion_hybrid(self, text: str) -> Dict:
-        """Hybrid approach combining semantic similarity and LLM analysis"""
+    def _classify_with_llm(self, text: str, context: Optional[EmbeddingContext] = None,
+                           timeout: Optional[float] = None) -> Optional[Dict]:
+        """LLM classification (cache tiers first), or None if the LLM fails or misses the deadline"""
+        llm_result = self.cached_classification(text, context)
+        if llm_result is None:
+            llm_result = ollama_client.generate_json(
+                self.create_classification_prompt(text), call_site="classify_emotion", timeout=timeout, cache=True
+            )
+            self.remember_classification(text, llm_result, context)
+        return llm_result
+    
+    async def _aclassify_with_llm(self, text: str, context: Optional[EmbeddingContext] = None,
+                                  timeout: Optional[float] = None, embedding: Optional[np.ndarray] = None) -> Optional[Dict]:
+        llm_result = await asyncio.to_thread(self.cached_classification, text, context, embedding)
+        if llm_result is None:
+            llm_result = await ollama_client.agenerate_json(
+                self.create_classification_prompt(text), call_site="classify_emotion", timeout=timeout, cache=True
+            )
+            await asyncio.to_thread(self.remember_classification, text, llm_result, context, embedding)
+        return llm_result
+    
+    def classify_emotion_llm(self, text: str, context: Optional[EmbeddingContext] = None) -> Dict:
+        """Use LLM for sophisticated emotion classification"""
+        llm_result = self._classify_with_llm(text, context)
+        # Fallback to semantic classification
+        return llm_result if llm_result is not None else self.classify_emotion_semantic(text, context)
+    
+    def classify_emotion_hybrid(self, text: str, context: Optional[EmbeddingContext] = None) -> Dict:
+        """Hybrid approach combining semantic similarity and LLM analysis
+        
+        In gated mode (EMOTION_LLM_GATE) the LLM is only consulted when the semantic
+        top-1 vs top-2 margin is below the calibrated threshold, and then at most once,
+        within EMOTION_LLM_DEADLINE; on failure the semantic result stands.
+        """
+        semantic_result = self.classify_emotion_semantic(text, context)
+        if EMOTION_LLM_GATE == "always":
+            return self.combine_classifications(semantic_result, self.classify_emotion_llm(text, context))
+        
+        if self.skip_llm(semantic_result):
+            self._count_gate("skipped")
+            return self.gated_classification(semantic_result)
+        
+        llm_result = self._classify_with_llm(text, context, timeout=EMOTION_LLM_DEADLINE)
+        self._count_gate("llm" if llm_result is not None else "llm_failed")
+        return self.combine_classifications(semantic_result, llm_result)
+    
+    async def classify_emotion_hybrid_async(self, text: str, context: Optional[EmbeddingContext] = None) -> Dict:
+        """classify_emotion_hybrid without blocking the event loop"""
+        if EMOTION_LLM_GATE == "always":
+            # Encode once up front: the request context is not thread-safe, so the two
+            # branches below share the vector instead of both reading the context
+            embedding = await asyncio.to_thread(self.message_embedding, text, context)
+            # The semantic pass runs in a worker thread while the LLM request is in flight
+            semantic_result, llm_result = await asyncio.gather(
+                asyncio.to_thread(self.classify_emotion_semantic, text, context, embedding),
+                self._aclassify_with_llm(text, context, embedding=embedding)
+            )
+            return self.combine_classifications(semantic_result, llm_result if llm_result is not None else semantic_result)
         
-        # Get both classifications
-        semantic_result = self.classify_emotion_semantic(text)
-        llm_result = self.classify_emotion_llm(text)
+        semantic_result = await asyncio.to_thread(self.classify_emotion_semantic, text, context)
+        if self.skip_llm(semantic_result):
+            self._count_gate("skipped")
+            return self.gated_classification(semantic_result)
         
-        # Use LLM result if available and confident, otherwise semantic
+        llm_result = await self._aclassify_with_llm(text, context, timeout=EMOTION_LLM_DEADLINE)
+        self._count_gate("llm" if llm_result is not None else "llm_failed")
+        return self.combine_classifications(semantic_result, llm_result)
+    
+    def gated_classification(self, semantic_result: Dict) -> Dict:
+        return {
+            'primary_emotion': semantic_result['primary_emotion'],
+            'confidence': semantic_result['confidence'],
+            'semantic_analysis': semantic_result,
+            'method': 'semantic_gated'
+        }
+    
+    def combine_classifications(self, semantic_result: Dict, llm_result: Dict) -> Dict:
+        """Use LLM result if available and confident, otherwise semantic"""
         if isinstance(llm_result, dict) and 'primary_emotion' in llm_result:
             llm_confidence = llm_result.get('confidence', 0.5)
             if isinstance(llm_confidence, str):
@@ -4,23 +4,74 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import time
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import ApplicationBuilder, MessageHandler, CommandHandler, ContextTypes, filters
 from src.application.db_manager import export_emotions_to_csv, get_emotion_statistics
 from src.application.music_engine import is_spotify_configured
 from src.application.core_engine import jarvis_core
+from src.application.ollama_client import ollama_client
+from src.vector_space.embedding_cache import embedding_cache
+from src.vector_space.embedding_batcher import embedding_batcher
+from src.vector_space.philosophy_rag import philosophy_rag
+from src.application.llm_cache import llm_cache
+from src.modeling.simple_emotion_model import simple_emotion_classifier
 from src.commonconst import (
     TELEGRAM_BOT_TOKEN, 
     WELCOME_MESSAGE, 
     ERROR_MESSAGE_TEMPLATE,
-    BOT_NAME
+    BOT_NAME,
+    TELEGRAM_STREAM_RESPONSES,
+    TELEGRAM_EDIT_INTERVAL
 )
 
-def process_emotion_request_safe(text: str, user_id: str = "default") -> dict:
+class StreamingReply:
+    """One Telegram message edited in place while the response streams in
+    
+    Telegram rate-limits message edits, so partial text is pushed at most once per
+    TELEGRAM_EDIT_INTERVAL; the first fragment is shown immediately and finish()
+    always writes the complete reply.
+    """
+    
+    def __init__(self, update: Update, interval: float = TELEGRAM_EDIT_INTERVAL):
+        self.update = update
+        self.interval = interval
+        self.message = None
+        self.shown = ""
+        self.last_edit = 0.0
+    
+    async def _show(self, text: str):
+        if text == self.shown:
+            return
+        try:
+            if self.message is None:
+                self.message = await self.update.message.reply_text(text)
+            else:
+                await self.message.edit_text(text)
+            self.shown = text
+        except TelegramError as e:
+            print(f"❌ Streaming edit failed: {e}")
+        self.last_edit = time.monotonic()
+    
+    async def on_token(self, text_so_far: str):
+        if time.monotonic() - self.last_edit >= self.interval:
+            await self._show(f"📚 {text_so_far.strip()} ▌")
+    
+    async def finish(self, text: str):
+        if self.message is None:
+            await self.update.message.reply_text(text)
+            return
+        await self._show(text)
+        if self.shown != text:
+            # The final edit failed: never leave the user with a truncated reply
+            await self.update.message.reply_text(text)
+
+async def process_emotion_request_safe(text: str, user_id: str = "default", on_token=None) -> dict:
     """Safe version using streamlined core engine with self-learning"""
     try:
-        # Use the streamlined core engine
-        result = jarvis_core.process_emotion(text, user_id)
+        # Awaits Ollama instead of blocking, so other chats keep being served meanwhile
+        result = await jarvis_core.process_emotion_async(text, user_id, on_token)
         return result
     except Exception as e:
         print(f"❌ Core engine error: {e}")
@@ -40,6 +91,17 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /status command"""
     spotify_status = "✅ Configured" if is_spotify_configured() else "❌ Not configured"
     stats = get_emotion_statistics()
+    cache_stats = embedding_cache.stats()
+    batcher_stats = embedding_batcher.stats()
+    candidate_stats = philosophy_rag.candidate_tables.stats()
+    saved_ms = candidate_stats['estimated_saved_ms']
+    candidate_saved = f"~{saved_ms:.0f} ms saved" if saved_ms is not None else "saving n/a"
+    gate_stats = simple_emotion_classifier.gate_stats()
+    llm_cache_sites = ", ".join(f"{site} {stats['hit_rate']:.0%}" for site, stats in llm_cache.stats().items()) or "no lookups yet"
+    first_tokens = ", ".join(
+        f"{site} {stats['avg_first_token_ms']:.0f} ms (of {stats['avg_ms']:.0f} ms)"
+        for site, stats in ollama_client.stats().items() if stats['streams']
+    ) or "no streamed replies yet"
     
     status_msg = f"""🔧 {BOT_NAME} System Status:
 
@@ -47,6 +109,12 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📊 Total Sessions: {stats['total_sessions']}
 😊 Top Emotion: {stats['top_emotions'][0][0] if stats['top_emotions'] else 'None'}
 📚 Favorite Book: {stats['top_books'][0][0] if stats['top_books'] else 'None'}
+🧮 Embedding Cache: {cache_stats['hit_rate']:.0%} hit rate ({cache_stats['hits']} hits / {cache_stats['misses']} misses)
+🧺 Embedding Batches: {batcher_stats['batches']} model calls, {batcher_stats['average_batch_size']:.1f} texts per batch
+🗂️ Candidate Tables: {candidate_stats['hit_rate']:.0%} hit rate ({candidate_saved})
+💾 LLM Cache: {llm_cache.overall_hit_rate():.0%} hit rate ({llm_cache_sites})
+⚡ LLM First Token: {first_tokens}
+🚦 LLM Gate: {gate_stats['skip_rate']:.0%} of classifications skipped the LLM ({gate_stats['llm_failed']} fell back after the deadline)
 
 Use /export to download your emotion history as CSV."""
     await update.message.reply_text(status_msg)
@@ -68,8 +136,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Show typing indicator
         await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
         
+        # Stream the response into one message that grows as tokens arrive
+        reply = StreamingReply(update) if TELEGRAM_STREAM_RESPONSES else None
+        
         # Process the emotional request with safe error handling
-        result = process_emotion_request_safe(user_input, user_id)
+        result = await process_emotion_request_safe(user_input, user_id, reply.on_token if reply else None)
         
         # Format response (plain text to avoid Markdown parsing errors)
         books_used = result['philosophy'].get('books_referenced', ['unknown'])
@@ -84,16 +155,24 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 📈 Learning: {result.get('learning', {}).get('learning_confidence', 0):.2f} confidence"""
         
-        await update.message.reply_text(response)
+        if reply:
+            await reply.finish(response)
+        else:
+            await update.message.reply_text(response)
         
     except Exception as e:
         print(f"❌ Error processing message: {e}")
         error_response = ERROR_MESSAGE_TEMPLATE.format(error=str(e))
         await update.message.reply_text(error_response)
 
+async def close_clients(app):
+    """Release the pooled Ollama connections when the bot stops"""
+    await ollama_client.aclose()
+
 def run_telegram_bot():
     """Run the Telegram bot"""
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    # Updates are handled concurrently: one slow generation must not hold up other users
+    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).concurrent_updates(True).post_shutdown(close_clients).build()
     
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("status", status))
@@ -0,0 +1,266 @@
+# src/vector_space/book_ingestion.py - Pluggable, Streaming Book Ingestion Pipeline
+
+import json
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from src.commonconst import EXTRA_BOOK_SPECS
+
+_WHITESPACE = " \t\n\r"
+# Characters that can continue a number raw_decode already accepted
+_NUMBER_CHARS = "0123456789.eE+-"
+
+def iter_json_items(path: Path, chunk_size: int = 1 << 16) -> Iterator:
+    """Stream the top level of a JSON file without loading it whole
+    
+    Yields each element of a top-level array, or (key, value) pairs of a top-level
+    object. Only one element is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        
+        def fill(size: int = chunk_size) -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(size)
+            if not chunk:
+                eof = True
+                return False
+            # Drop the consumed prefix once, then append
+            if pos:
+                buffer = buffer[pos:]
+                pos = 0
+            buffer += chunk
+            return True
+        
+        def skip(chars: str):
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return
+        
+        def decode():
+            nonlocal pos
+            read_size = chunk_size
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # A number cut at the chunk boundary ("0." or "12" of "123") decodes as a
+                    # shorter one; it is only complete once something else follows it
+                    number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                    if eof or not (number and (end == len(buffer) or buffer[end] in _NUMBER_CHARS)):
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                # Element spans the chunk boundary: read more, growing only while this element is incomplete
+                if not fill(read_size):
+                    value, pos = decoder.raw_decode(buffer, pos)
+                    return value
+                read_size *= 2
+        
+        skip(_WHITESPACE)
+        if pos >= len(buffer):
+            return
+        opening = buffer[pos]
+        pos += 1
+        
+        if opening not in "[{":
+            raise ValueError(f"{path}: top level must be a JSON array or object")
+        closing = "]" if opening == "[" else "}"
+        
+        while True:
+            skip(_WHITESPACE + ",")
+            if pos >= len(buffer):
+                raise ValueError(f"{path}: unexpected end of file")
+            if buffer[pos] == closing:
+                return
+            
+            if opening == "[":
+                yield decode()
+            else:
+                key = decode()
+                skip(_WHITESPACE + ":")
+                yield key, decode()
+
+class _TemplateValues(dict):
+    """Field lookup for templates: missing fields render as empty strings"""
+    
+    def __missing__(self, key):
+        return ""
+
+class SpecBookParser:
+    """Book parser driven by a mapping spec instead of code
+    
+    Spec keys:
+        root: "array" (iterate elements) or "object" (iterate key/value pairs)
+        key_field: record field that receives the object key (object roots only)
+        items: optional list field inside each top-level element to iterate instead
+        require: item fields that must be present
+        require_values: item fields that must be non-empty
+        fields: record field -> format template over item fields, e.g. "{source} {target}"
+        extra: record field -> item field copied as-is ('' when missing)
+        type: value of the record's 'type' field
+    """
+    
+    def __init__(self, spec: Dict):
+        self.spec = spec
+    
+    def _iter_items(self, path: Path) -> Iterator[Tuple[Optional[str], Dict]]:
+        items_field = self.spec.get("items")
+        for element in iter_json_items(path):
+            key = None
+            if self.spec.get("root", "array") == "object":
+                if not isinstance(element, tuple):
+                    continue
+                key, element = element
+            
+            if not isinstance(element, dict):
+                continue
+            
+            if items_field:
+                for item in element.get(items_field, []) or []:
+                    if isinstance(item, dict):
+                        yield key, item
+            else:
+                yield key, element
+    
+    def __call__(self, book: str, path: Path) -> Iterator[Dict]:
+        fields = self.spec["fields"]
+        require = self.spec.get("require", [])
+        require_values = self.spec.get("require_values", [])
+        
+        for key, item in self._iter_items(path):
+            if any(name not in item for name in require) or not all(item.get(name) for name in require_values):
+                continue
+            
+            values = _TemplateValues(item)
+            record = {name: template.format_map(values) for name, template in fields.items()}
+            record['book'] = book
+            if self.spec.get("key_field"):
+                record[self.spec["key_field"]] = key
+            for name, source_field in self.spec.get("extra", {}).items():
+                record[name] = item.get(source_field, '')
+            record['type'] = self.spec.get("type", "passage")
+            yield record
+
+QUOTE_FIELDS = {"text": "{source} {target}", "source": "{source}", "translation": "{target}"}
+
+BOOK_PARSERS: Dict[str, Callable[[str, Path], Iterator[Dict]]] = {}
+
+def register_book_parser(book: str, parser):
+    """Register a parser callable(book, path) -> records, or a mapping spec dict"""
+    BOOK_PARSERS[book] = SpecBookParser(parser) if isinstance(parser, dict) else parser
+
+register_book_parser("analects", {
+    "items": "entries", "require": ["source", "target"], "fields": QUOTE_FIELDS, "type": "quote"
+})
+register_book_parser("mencius", {
+    "items": "contents", "require": ["source", "target"], "fields": QUOTE_FIELDS, "type": "quote"
+})
+register_book_parser("tao_te_ching", {
+    "require_values": ["original", "translation"],
+    "fields": {"text": "{original} {translation}", "source": "{original}", "translation": "{translation}"},
+    "extra": {"chapter": "chapter_number"},
+    "type": "chapter"
+})
+register_book_parser("iching", {
+    "require_values": ["hexagram_name", "symbolic_meaning"],
+    "fields": {
+        "text": "{hexagram_name} {hexagram_chinese} {symbolic_meaning}",
+        "source": "{hexagram_name} ({hexagram_chinese})",
+        "translation": "{symbolic_meaning}"
+    },
+    "type": "hexagram"
+})
+for _psy_book in ("positive_psy", "social_psy"):
+    register_book_parser(_psy_book, {
+        "root": "object", "key_field": "category", "items": "concepts",
+        "require": ["term", "definition"],
+        "fields": {"text": "{term} {definition}", "source": "{term}", "translation": "{definition}"},
+        "type": "concept"
+    })
+
+# Books declared in book/book_parsers.json need no code at all
+for _book, _spec in EXTRA_BOOK_SPECS.items():
+    register_book_parser(_book, _spec)
+
+def iter_book_records(book: str, path: Path) -> Iterator[Dict]:
+    """Stream one book's records through its registered parser"""
+    parser = BOOK_PARSERS.get(book)
+    if parser is None:
+        raise KeyError(f"No parser registered for book '{book}'")
+    return parser(book, path)
+
+def _parse_book_into_queue(parser, book: str, path: Path, batch_size: int, out_queue):
+    """Worker process: stream one book and hand records over in batches"""
+    try:
+        batch = []
+        for record in parser(book, path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                out_queue.put((book, batch, None))
+                batch = []
+        if batch:
+            out_queue.put((book, batch, None))
+        out_queue.put((book, None, None))
+    except Exception as e:
+        out_queue.put((book, None, f"{type(e).__name__}: {e}"))
+
+def stream_record_batches(books: Dict[str, Path], batch_size: int,
+                          workers: int) -> Iterator[Tuple[str, Optional[List[Dict]], Optional[str]]]:
+    """Parse books in parallel and yield (book, records, error) as batches become ready
+    
+    `records` is None once a book is finished (`error` is set if it failed), so the
+    caller can encode each batch while other books are still being parsed.
+    """
+    if workers <= 1 or len(books) <= 1:
+        for book, path in books.items():
+            try:
+                batch = []
+                for record in iter_book_records(book, path):
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        yield book, batch, None
+                        batch = []
+                if batch:
+                    yield book, batch, None
+                yield book, None, None
+            except Exception as e:
+                yield book, None, f"{type(e).__name__}: {e}"
+        return
+    
+    # spawn keeps workers clear of any torch threads already running in this process
+    mp_context = multiprocessing.get_context("spawn")
+    with mp_context.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=min(workers, len(books)), mp_context=mp_context) as pool:
+        out_queue = manager.Queue()
+        futures = []
+        for book, path in books.items():
+            parser = BOOK_PARSERS.get(book)
+            if parser is None:
+                yield book, None, f"No parser registered for book '{book}'"
+                continue
+            futures.append(pool.submit(_parse_book_into_queue, parser, book, Path(path), batch_size, out_queue))
+        
+        remaining = len(futures)
+        while remaining:
+            try:
+                book, batch, error = out_queue.get(timeout=1.0)
+            except queue.Empty:
+                # Surface worker crashes that never reached the queue
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+                continue
+            if batch is None:
+                remaining -= 1
+            yield book, batch, error
@@ -0,0 +1,153 @@
+# src/vector_space/candidate_tables.py - Precomputed Emotion x Book Candidate Tables
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import hashlib
+import json
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from src.commonconst import RAG_CANDIDATE_TABLE_SIZE
+
+class CandidateTables:
+    """Top-N passage rows for every (emotion, book) pair
+    
+    The classifier emits a handful of canonical emotions, so the passages worth
+    considering for "<text> <emotion>" in one book are mostly the ones closest to the
+    emotion itself. Queries are re-ranked against those few rows only and fall back
+    to the full index when the candidates score poorly. Tables are stored next to the
+    corpus store and tagged with a signature of its manifest, so any corpus change
+    (or change of emotion queries) regenerates them. Each book's rows are also tagged
+    with the book hash they were built from and are ignored for any other version.
+    """
+    
+    def __init__(self, size: int = RAG_CANDIDATE_TABLE_SIZE):
+        self.size = size
+        self.signature: Optional[str] = None
+        # (emotion, book) -> (book hash, rows); replaced in one assignment on rebuild
+        self.tables: Dict[Tuple[str, str], Tuple[Optional[str], np.ndarray]] = {}
+        
+        self._stats_lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.candidate_seconds = 0.0
+        self.full_searches = 0
+        self.full_seconds = 0.0
+        # Full-search latency probed when the tables were (re)loaded, used until real ones are timed
+        self.baseline_full_seconds: Optional[float] = None
+    
+    def compute_signature(self, manifest: Dict, emotion_queries: Dict[str, str]) -> str:
+        payload = json.dumps({"manifest": manifest, "emotions": emotion_queries, "size": self.size}, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def build(self, path: Path, segments: Dict, emotions: List[str], emotion_matrix: np.ndarray, signature: str):
+        """Score every passage against every emotion query and keep the top rows per book"""
+        tables = {}
+        for book, segment in segments.items():
+            scores = np.asarray(segment.embeddings, dtype=np.float32) @ emotion_matrix.T
+            keep = min(self.size, len(scores))
+            if keep == 0:
+                continue
+            top = np.argpartition(-scores, keep - 1, axis=0)[:keep]
+            for column, emotion in enumerate(emotions):
+                tables[(emotion, book)] = (segment.book_hash, np.sort(top[:, column]).astype(np.int32))
+        
+        self.tables = tables
+        self.signature = signature
+        self.save(path)
+    
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                signature=np.array(self.signature or ""),
+                book_hashes=np.array(json.dumps({book: book_hash for (_, book), (book_hash, _) in self.tables.items()})),
+                **{f"table:{emotion}|{book}": rows for (emotion, book), (_, rows) in self.tables.items()}
+            )
+        os.replace(tmp_path, path)
+    
+    def load(self, path: Path, signature: str) -> bool:
+        """Load persisted tables if they were built for this exact signature"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["signature"]) != signature:
+                    return False
+                book_hashes = json.loads(str(data["book_hashes"]))
+                tables = {}
+                for key in data.files:
+                    if key.startswith("table:"):
+                        emotion, book = key[len("table:"):].split("|", 1)
+                        tables[(emotion, book)] = (book_hashes.get(book), data[key])
+        except (OSError, KeyError, ValueError):
+            return False
+        
+        self.tables = tables
+        self.signature = signature
+        return True
+    
+    def lookup(self, emotion: Optional[str], segment) -> Optional[np.ndarray]:
+        """Candidate rows for this emotion in this exact segment version (None if there is no table)"""
+        entry = self.tables.get((emotion.lower(), segment.book)) if emotion else None
+        if entry is None or entry[0] != segment.book_hash:
+            return None
+        return entry[1]
+    
+    def record_candidate(self, seconds: float, hit: bool):
+        with self._stats_lock:
+            self.lookups += 1
+            self.candidate_seconds += seconds
+            if hit:
+                self.hits += 1
+            else:
+                self.fallbacks += 1
+    
+    def record_full(self, seconds: float):
+        with self._stats_lock:
+            self.full_searches += 1
+            self.full_seconds += seconds
+    
+    def record_baseline(self, seconds: float):
+        with self._stats_lock:
+            self.baseline_full_seconds = seconds if seconds > 0 else None
+    
+    def stats(self) -> Dict:
+        """Hit rate and latency saved, estimated from the average full-search latency
+        
+        Until a real full search has been timed, the probed baseline stands in for it;
+        with neither, the saving is unknown (None).
+        """
+        with self._stats_lock:
+            if self.full_searches:
+                avg_full_ms = 1000 * self.full_seconds / self.full_searches
+            elif self.baseline_full_seconds is not None:
+                avg_full_ms = 1000 * self.baseline_full_seconds
+            else:
+                avg_full_ms = None
+            avg_candidate_ms = 1000 * self.candidate_seconds / self.lookups if self.lookups else 0.0
+            return {
+                "tables": len(self.tables),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "avg_candidate_ms": avg_candidate_ms,
+                "avg_full_ms": avg_full_ms,
+                "estimated_saved_ms": (max(0.0, self.hits * avg_full_ms - 1000 * self.candidate_seconds)
+                                       if avg_full_ms is not None else None)
+            }
+
+if __name__ == "__main__":
+    # Offline precompute: python -m src.vector_space.candidate_tables
+    from src.modeling.simple_emotion_model import simple_emotion_classifier
+    from src.vector_space.philosophy_rag import philosophy_rag
+    
+    philosophy_rag.build_candidate_tables(simple_emotion_classifier.get_profile_texts())
+    print(f"✅ {len(philosophy_rag.candidate_tables.tables)} candidate tables "
+          f"({philosophy_rag.candidate_tables.size} passages each) ready")
@@ -0,0 +1,247 @@
+# src/vector_space/compression.py - Dimensionality Reduction and Compressed Vector Storage
+
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from src.commonconst import (
+    RAG_COMPRESSION,
+    RAG_COMPRESSED_DIM,
+    RAG_VECTOR_DTYPE,
+    RAG_PQ_SUBQUANTIZERS
+)
+from src.vector_space.vector_index import VectorIndex, BruteForceIndex, create_vector_index, faiss
+
+def compression_enabled(compression: str = RAG_COMPRESSION, dtype: str = RAG_VECTOR_DTYPE) -> bool:
+    return compression != "none" or dtype != "float32"
+
+def compression_key(compression: str = RAG_COMPRESSION, dim: int = RAG_COMPRESSED_DIM,
+                    dtype: str = RAG_VECTOR_DTYPE) -> str:
+    """Short tag naming the compression settings, e.g. 'pca128-float16'"""
+    projection = "full" if compression == "none" else f"{compression}{dim}"
+    return f"{projection}-{dtype}"
+
+class FaissStorage(VectorIndex):
+    """Minimal VectorIndex around an already-constructed FAISS index (PQ storage)"""
+    
+    def __init__(self, index):
+        self.index = index
+    
+    def _configure(self):
+        pass
+    
+    def build(self, embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if not self.index.is_trained:
+            self.index.train(embeddings)
+        self.index.add(embeddings)
+    
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        return self.index.search(queries, min(top_k, len(self)))
+    
+    def __len__(self) -> int:
+        return 0 if self.index is None else self.index.ntotal
+
+class CompressedIndex(VectorIndex):
+    """Vector index over projected and/or compressed copies of the corpus embeddings
+    
+    Projection: "pca" (uncentered SVD, so projected inner products approximate the
+    original cosines), "opq" (FAISS rotation learned for product quantization) or
+    "none". Storage: "float32" (the configured index backend over projected vectors),
+    "float16" (half-precision matrix scanned in blocks) or "pq" (FAISS product
+    quantization). Queries are projected on the fly. Each search oversamples the
+    compressed index and rescores the candidates exactly against the full-precision
+    embeddings, which stay memory-mapped on disk and are only paged in row by row.
+    """
+    
+    backend = "compressed"
+    persistent = True
+    rescore_factor = 4
+    block_size = 4096
+    
+    def __init__(self, index_backend: str, compression: str = RAG_COMPRESSION, dim: int = RAG_COMPRESSED_DIM,
+                 dtype: str = RAG_VECTOR_DTYPE, subquantizers: int = RAG_PQ_SUBQUANTIZERS):
+        self.index_backend = index_backend
+        self.compression = compression
+        self.dim = dim
+        self.dtype = dtype
+        self.subquantizers = subquantizers
+        if (compression == "opq" or dtype == "pq") and faiss is None:
+            print("📦 faiss not installed, using PCA + float16 compression: pip install faiss-cpu")
+            self.compression = "pca" if compression == "opq" else compression
+            self.dtype = "float16" if dtype == "pq" else dtype
+        
+        self.source: Optional[np.ndarray] = None
+        self.projection: Optional[np.ndarray] = None
+        self.matrix: Optional[np.ndarray] = None
+        self.inner: Optional[VectorIndex] = None
+        self.report: Dict = {}
+    
+    def _fit_projection(self, embeddings: np.ndarray):
+        """Learn an (input_dim, dim) projection matrix; none keeps the full dimension"""
+        dim = min(self.dim, embeddings.shape[1])
+        # Fit on a sample: a few thousand rows span the embedding space well enough
+        sample = np.asarray(
+            embeddings[np.linspace(0, len(embeddings) - 1, min(len(embeddings), 20000)).astype(np.int64)],
+            dtype=np.float32
+        )
+        
+        if self.compression == "opq" and len(sample) >= 256:
+            dim -= dim % self.subquantizers
+            opq = faiss.OPQMatrix(embeddings.shape[1], self.subquantizers, dim)
+            opq.train(np.ascontiguousarray(sample))
+            # OPQ is a learned linear map without bias: keep its matrix and apply it like PCA
+            self.projection = np.ascontiguousarray(
+                faiss.vector_to_array(opq.A).reshape(dim, embeddings.shape[1]).T, dtype=np.float32
+            )
+        elif self.compression in ("pca", "opq"):
+            # Uncentered SVD: the top right-singular vectors preserve inner products best
+            _, _, vt = np.linalg.svd(sample, full_matrices=False)
+            self.projection = np.ascontiguousarray(vt[:dim].T, dtype=np.float32)
+    
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+        return vectors @ self.projection if self.projection is not None else vectors
+    
+    def build(self, embeddings: np.ndarray):
+        self.source = embeddings
+        self._fit_projection(embeddings)
+        
+        projected = np.vstack([
+            self.project(embeddings[start:start + self.block_size])
+            for start in range(0, len(embeddings), self.block_size)
+        ]) if len(embeddings) else np.zeros((0, self.dim), dtype=np.float32)
+        
+        if self.dtype == "float16":
+            self.matrix = projected.astype(np.float16)
+        elif self.dtype == "pq":
+            subquantizers = self.subquantizers if projected.shape[1] % self.subquantizers == 0 else 1
+            # 8-bit codebooks need 256+ training points; small books get smaller codebooks
+            nbits = int(max(1, min(8, np.floor(np.log2(max(len(projected), 2))))))
+            self.inner = FaissStorage(faiss.IndexPQ(projected.shape[1], subquantizers, nbits, faiss.METRIC_INNER_PRODUCT))
+            self.inner.build(projected)
+        else:
+            self.inner = create_vector_index(self.index_backend)
+            self.inner.build(projected)
+        
+        self.report = self.measure_recall(embeddings)
+        if self.report:
+            print(f"📉 Compressed index {compression_key(self.compression, self.dim, self.dtype)}: "
+                  f"recall@{self.report['k']} {self.report['recall_at_k']:.3f} "
+                  f"(before rescoring {self.report['raw_recall_at_k']:.3f}), "
+                  f"{self.report['full_mb']:.2f} MB -> {self.report['compressed_mb']:.2f} MB")
+    
+    def _search_compressed(self, queries: np.ndarray, top_k: int) -> np.ndarray:
+        projected = self.project(queries)
+        if self.matrix is None:
+            return self.inner.search(projected, top_k)[1]
+        
+        scores = np.hstack([
+            projected @ self.matrix[start:start + self.block_size].astype(np.float32).T
+            for start in range(0, len(self.matrix), self.block_size)
+        ])
+        k = min(top_k, scores.shape[1])
+        return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        k = min(top_k, len(self))
+        if k <= 0:
+            return (np.zeros((len(queries), 0), dtype=np.float32),
+                    np.zeros((len(queries), 0), dtype=np.int64))
+        
+        candidates = self._search_compressed(queries, k * self.rescore_factor)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        
+        # Exact rescoring from the full-precision rows of the candidates only
+        for i, (query, rows) in enumerate(zip(queries, candidates)):
+            rows = np.unique(rows[rows >= 0])
+            if not len(rows):
+                continue
+            scores = np.asarray(self.source[rows], dtype=np.float32) @ query
+            order = np.argsort(-scores)[:k]
+            all_scores[i, :len(order)] = scores[order]
+            all_ids[i, :len(order)] = rows[order]
+        return all_scores, all_ids
+    
+    def measure_recall(self, embeddings: np.ndarray, sample_size: int = 200, k: int = 10) -> Dict:
+        """Recall@k of the compressed index against exact search, using corpus rows as queries"""
+        count = len(embeddings)
+        if count == 0:
+            return {}
+        k = min(k, count)
+        sample = np.asarray(
+            embeddings[np.linspace(0, count - 1, min(sample_size, count)).astype(np.int64)], dtype=np.float32
+        )
+        
+        exact = BruteForceIndex()
+        exact.build(embeddings)
+        _, truth = exact.search(sample, k)
+        raw = self._search_compressed(sample, k)
+        _, rescored = self.search(sample, k)
+        
+        def recall(found: np.ndarray) -> float:
+            return float(np.mean([len(set(row) & set(expected)) / k for row, expected in zip(found.tolist(), truth.tolist())]))
+        
+        full_bytes = count * embeddings.shape[1] * 4
+        return {
+            "recall_at_k": recall(rescored),
+            "raw_recall_at_k": recall(raw),
+            "k": k,
+            "dim": int(self.project(sample[:1]).shape[1]),
+            "compressed_mb": self.memory_bytes() / 2 ** 20,
+            "full_mb": full_bytes / 2 ** 20
+        }
+    
+    def memory_bytes(self) -> int:
+        """Size of the compressed vectors (the projection matrix is not counted)"""
+        if self.matrix is not None:
+            return self.matrix.nbytes
+        if isinstance(self.inner, BruteForceIndex):
+            return self.inner.embeddings.nbytes
+        if self.inner is not None:
+            return len(faiss.serialize_index(self.inner.index))
+        return 0
+    
+    def save(self, path: Path):
+        arrays = {"report_recall": np.array([self.report.get("recall_at_k", 0.0), self.report.get("raw_recall_at_k", 0.0)])}
+        if self.projection is not None:
+            arrays["projection"] = self.projection
+        if self.matrix is not None:
+            arrays["matrix"] = self.matrix
+        elif isinstance(self.inner, BruteForceIndex):
+            arrays["matrix32"] = self.inner.embeddings
+        elif self.inner is not None:
+            arrays["faiss"] = faiss.serialize_index(self.inner.index)
+        
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+    
+    def load(self, path: Path) -> bool:
+        """Restore a saved index (attach() must then be given the segment embeddings)"""
+        if not Path(path).exists():
+            return False
+        
+        with np.load(path, allow_pickle=False) as data:
+            self.projection = data["projection"] if "projection" in data.files else None
+            self.matrix = data["matrix"] if "matrix" in data.files else None
+            if "matrix32" in data.files:
+                self.inner = BruteForceIndex()
+                self.inner.build(data["matrix32"])
+            elif "faiss" in data.files:
+                self.inner = create_vector_index(self.index_backend) if self.dtype != "pq" else FaissStorage(None)
+                self.inner.index = faiss.deserialize_index(data["faiss"])
+                self.inner._configure()
+            recall, raw_recall = data["report_recall"].tolist()
+            self.report = {"recall_at_k": recall, "raw_recall_at_k": raw_recall}
+        return True
+    
+    def attach(self, embeddings: np.ndarray):
+        """Point exact rescoring at the (memory-mapped) full-precision embeddings after load()"""
+        self.source = embeddings
+    
+    def __len__(self) -> int:
+        if self.matrix is not None:
+            return len(self.matrix)
+        return 0 if self.inner is None else len(self.inner)
@@ -0,0 +1,176 @@
+# src/vector_space/corpus_store.py - Column-wise Corpus Storage and Zero-copy Passage Views
+
+import json
+import numpy as np
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+# Cell kinds in the string columns
+_ABSENT, _STRING, _JSON = 0, 1, 2
+
+# Distinct values a uint16 category code can address
+_CODE_LIMIT = np.iinfo(np.uint16).max + 1
+
+class CorpusColumns:
+    """Passages stored as columns instead of one dict per passage
+    
+    `book` and `type` are interned: a small category list plus one integer code per
+    row. Every other field is a cell in one shared UTF-8 buffer addressed by
+    offsets[row * field_count + field] .. offsets[... + 1]. Non-string values (e.g.
+    chapter numbers) are stored as JSON and decoded on access.
+    """
+    
+    def __init__(self, books: List[str], book_codes: np.ndarray, types: List[str], type_codes: np.ndarray,
+                 fields: List[str], buffer: np.ndarray, offsets: np.ndarray, kinds: np.ndarray):
+        self.books = books
+        self.book_codes = book_codes
+        self.types = types
+        self.type_codes = type_codes
+        self.fields = fields
+        self.field_positions = {name: position for position, name in enumerate(fields)}
+        self.buffer = buffer
+        self.offsets = offsets
+        self.kinds = kinds
+    
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "CorpusColumns":
+        books, types, fields = {}, {}, {}
+        for record in records:
+            for name in record:
+                if name not in ('book', 'type'):
+                    fields.setdefault(name, len(fields))
+        
+        book_codes = np.empty(len(records), dtype=np.uint16)
+        type_codes = np.empty(len(records), dtype=np.uint16)
+        kinds = np.zeros((len(records), len(fields)), dtype=np.uint8)
+        offsets = np.zeros(len(records) * len(fields) + 1, dtype=np.int64)
+        chunks = []
+        position = 0
+        
+        for row, record in enumerate(records):
+            book_code = books.setdefault(record.get('book', ''), len(books))
+            type_code = types.setdefault(record.get('type', ''), len(types))
+            if max(book_code, type_code) >= _CODE_LIMIT:
+                raise ValueError(f"More than {_CODE_LIMIT} distinct books or types cannot be interned as uint16 codes")
+            book_codes[row], type_codes[row] = book_code, type_code
+            for name, field in fields.items():
+                cell = row * len(fields) + field
+                if name in record:
+                    value = record[name]
+                    if isinstance(value, str):
+                        kinds[row, field] = _STRING
+                    else:
+                        kinds[row, field] = _JSON
+                        value = json.dumps(value, ensure_ascii=False)
+                    data = value.encode('utf-8')
+                    chunks.append(data)
+                    position += len(data)
+                offsets[cell + 1] = position
+        
+        buffer = np.frombuffer(b"".join(chunks), dtype=np.uint8)
+        return cls(list(books), book_codes, list(types), type_codes, list(fields), buffer, offsets, kinds)
+    
+    def save(self, f):
+        """Write all columns into one .npz (path or binary file object)"""
+        np.savez(
+            f,
+            books=np.array(self.books, dtype=str),
+            book_codes=self.book_codes,
+            types=np.array(self.types, dtype=str),
+            type_codes=self.type_codes,
+            fields=np.array(self.fields, dtype=str),
+            buffer=self.buffer,
+            offsets=self.offsets,
+            kinds=self.kinds
+        )
+    
+    @classmethod
+    def load(cls, path) -> "CorpusColumns":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["books"].tolist(), data["book_codes"],
+                data["types"].tolist(), data["type_codes"],
+                data["fields"].tolist(), data["buffer"], data["offsets"], data["kinds"]
+            )
+    
+    def value(self, row: int, name: str) -> Any:
+        """Decode one field of one row (KeyError when the row has no such field)"""
+        if name == 'book':
+            return self.books[self.book_codes[row]]
+        if name == 'type':
+            return self.types[self.type_codes[row]]
+        
+        field = self.field_positions.get(name)
+        if field is None or self.kinds[row, field] == _ABSENT:
+            raise KeyError(name)
+        
+        cell = row * len(self.fields) + field
+        text = self.buffer[self.offsets[cell]:self.offsets[cell + 1]].tobytes().decode('utf-8')
+        return text if self.kinds[row, field] == _STRING else json.loads(text)
+    
+    def row_fields(self, row: int) -> List[str]:
+        present = [name for name, field in self.field_positions.items() if self.kinds[row, field] != _ABSENT]
+        return ['book', 'type'] + present
+    
+    def column(self, name: str) -> List[Any]:
+        """All values of one field ('' for rows without it)"""
+        field = self.field_positions.get(name)
+        if name not in ('book', 'type') and field is None:
+            return [''] * len(self)
+        return [self.value(row, name) if field is None or self.kinds[row, field] else ''
+                for row in range(len(self))]
+    
+    def view(self, row: int, doc_id: Optional[str] = None, relevance_score: Optional[float] = None,
+             duplicate_ids: Optional[List[str]] = None) -> "PassageView":
+        return PassageView(self, row, doc_id, relevance_score, duplicate_ids)
+    
+    def __len__(self) -> int:
+        return len(self.book_codes)
+    
+    def __getitem__(self, row: int) -> "PassageView":
+        return self.view(row)
+    
+    def __iter__(self) -> Iterator["PassageView"]:
+        return (self.view(row) for row in range(len(self)))
+
+class PassageView(Mapping):
+    """Read-only dict-like view of one passage; fields are decoded from the columns on access"""
+    
+    __slots__ = ('columns', 'row', 'doc_id', 'relevance_score', 'duplicate_ids')
+    
+    def __init__(self, columns: CorpusColumns, row: int, doc_id: Optional[str] = None,
+                 relevance_score: Optional[float] = None, duplicate_ids: Optional[List[str]] = None):
+        self.columns = columns
+        self.row = row
+        self.doc_id = doc_id
+        self.relevance_score = relevance_score
+        # Near-duplicate hits from other books that were collapsed into this one
+        self.duplicate_ids = duplicate_ids
+    
+    def _keys(self) -> List[str]:
+        keys = self.columns.row_fields(self.row)
+        for key in ('doc_id', 'relevance_score', 'duplicate_ids'):
+            if getattr(self, key) is not None:
+                keys.append(key)
+        return keys
+    
+    def __getitem__(self, key: str) -> Any:
+        if key in ('doc_id', 'relevance_score', 'duplicate_ids'):
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        return self.columns.value(self.row, key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys())
+    
+    def __len__(self) -> int:
+        return len(self._keys())
+    
+    def copy(self) -> Dict:
+        """Materialize as a plain dict"""
+        return dict(self.items())
+    
+    def __repr__(self) -> str:
+        return f"PassageView({self.copy()!r})"
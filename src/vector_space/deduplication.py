@@ -0,0 +1,72 @@
+# src/vector_space/deduplication.py - Near-duplicate Passage Detection and Corpus Compaction
+
+import numpy as np
+from typing import Dict, List, Tuple
+
+ALIAS_FIELDS = ("book", "source", "translation")
+
+def cluster_near_duplicates(embeddings: np.ndarray, threshold: float, block_size: int = 1024) -> np.ndarray:
+    """Map every row to its cluster representative (itself if it is one)
+    
+    Greedy in corpus order: the first passage of a cluster is kept and every later
+    passage with cosine similarity >= threshold to it joins the cluster. Similarities
+    are computed one block of rows at a time against the whole (normalized) matrix.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    count = len(matrix)
+    representative = np.arange(count)
+    assigned = np.zeros(count, dtype=bool)
+    
+    for start in range(0, count, block_size):
+        block = matrix[start:start + block_size]
+        similarity = block @ matrix.T
+        for offset in range(len(block)):
+            row = start + offset
+            if assigned[row]:
+                continue
+            members = np.flatnonzero(similarity[offset] >= threshold)
+            members = members[(members > row) & ~assigned[members]]
+            assigned[members] = True
+            representative[members] = row
+    
+    return representative
+
+def compact_corpus(records: List[Dict], embeddings: np.ndarray, threshold: float) -> Tuple[List[Dict], np.ndarray]:
+    """Keep one passage per near-duplicate cluster; the others become its 'aliases' for attribution"""
+    representative = cluster_near_duplicates(embeddings, threshold)
+    keep = np.flatnonzero(representative == np.arange(len(records)))
+    
+    aliases: Dict[int, List[Dict]] = {}
+    for row in np.flatnonzero(representative != np.arange(len(records))).tolist():
+        alias = {field: records[row][field] for field in ALIAS_FIELDS if field in records[row]}
+        aliases.setdefault(int(representative[row]), []).append(alias)
+    
+    compacted = []
+    for row in keep.tolist():
+        record = dict(records[row])
+        if row in aliases:
+            record['aliases'] = aliases[row]
+        compacted.append(record)
+    
+    return compacted, np.asarray(embeddings, dtype=np.float32)[keep]
+
+def collapse_duplicate_hits(embeddings: np.ndarray, threshold: float) -> Dict[int, List[int]]:
+    """Collapse near-duplicates among ranked hits (best first)
+    
+    Returns kept position -> positions collapsed into it; positions missing from
+    the result were collapsed.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    similarity = matrix @ matrix.T
+    kept: Dict[int, List[int]] = {}
+    collapsed = np.zeros(len(similarity), dtype=bool)
+    
+    for position in range(len(similarity)):
+        if collapsed[position]:
+            continue
+        duplicates = np.flatnonzero(similarity[position] >= threshold)
+        duplicates = duplicates[(duplicates > position) & ~collapsed[duplicates]]
+        collapsed[duplicates] = True
+        kept[position] = duplicates.tolist()
+    
+    return kept
@@ -0,0 +1,215 @@
+# src/vector_space/embedding_backends.py - Pluggable CPU Embedding Backends
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import importlib.util
+import time
+import numpy as np
+from pathlib import Path
+from typing import Dict, List
+from src.commonconst import DB_DIR, EMBEDDING_MODEL_NAME
+from src.vector_space.embedding_utils import l2_normalize
+
+ONNX_EXPORT_DIR = DB_DIR / "onnx"
+
+class EmbeddingBackend:
+    """Interface shared by all embedding backends (mirrors SentenceTransformer.encode)"""
+    
+    name = "base"
+    # Modules that must be importable beyond sentence_transformers
+    requires = ()
+    
+    def encode(self, sentences: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs) -> np.ndarray:
+        raise NotImplementedError
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        raise NotImplementedError
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Full-precision PyTorch SentenceTransformer (the reference implementation)"""
+    
+    name = "torch"
+    
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+    
+    def encode(self, sentences: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs) -> np.ndarray:
+        return self.model.encode(sentences, batch_size=batch_size, show_progress_bar=show_progress_bar,
+                                 convert_to_numpy=True)
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+class QuantizedTorchBackend(SentenceTransformerBackend):
+    """Reference model with every nn.Linear dynamically quantized to int8"""
+    
+    name = "int8"
+    
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        super().__init__(model_name)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxBackend(EmbeddingBackend):
+    """Transformer exported to ONNX and run with ONNX Runtime, pooled like the reference model"""
+    
+    name = "onnx"
+    requires = ("onnxruntime",)
+    
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, export_dir: Path = ONNX_EXPORT_DIR):
+        import onnxruntime as ort
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize
+        
+        reference = SentenceTransformer(model_name, device="cpu")
+        transformer = reference[0]
+        self.tokenizer = transformer.tokenizer
+        self.max_seq_length = transformer.max_seq_length
+        self.dimension = reference.get_sentence_embedding_dimension()
+        self.normalize = any(isinstance(module, Normalize) for module in reference)
+        
+        onnx_path = Path(export_dir) / f"{model_name.replace('/', '_')}.onnx"
+        if not onnx_path.exists():
+            self._export(transformer.auto_model, onnx_path)
+        
+        self.session = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+    
+    def _export(self, auto_model, onnx_path: Path):
+        """One-off export of the HuggingFace transformer to ONNX"""
+        import torch
+        print(f"📦 Exporting embedding model to {onnx_path}...")
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        dummy = self.tokenizer(["export warm up"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+        
+        auto_model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model,
+                tuple(dummy[name] for name in input_names),
+                str(onnx_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+    
+    def encode(self, sentences: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        if not sentences:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        
+        # Sort by length so each batch pads as little as possible
+        order = np.argsort([-len(sentence) for sentence in sentences])
+        embeddings = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        
+        for start in range(0, len(sentences), batch_size):
+            batch_ids = order[start:start + batch_size]
+            tokens = self.tokenizer([sentences[i] for i in batch_ids], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            token_embeddings = self.session.run(["last_hidden_state"], feeds)[0]
+            
+            # Mean pooling over non-padding tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            embeddings[batch_ids] = pooled
+        
+        return l2_normalize(embeddings) if self.normalize else embeddings
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+EMBEDDING_BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    QuantizedTorchBackend.name: QuantizedTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+def resolve_embedding_backend(backend: str) -> str:
+    """Name of the backend create_embedding_backend will load, without loading it"""
+    backend_cls = EMBEDDING_BACKENDS.get(backend)
+    if backend_cls is None or any(importlib.util.find_spec(module) is None for module in backend_cls.requires):
+        return SentenceTransformerBackend.name
+    return backend_cls.name
+
+def create_embedding_backend(backend: str, model_name: str = EMBEDDING_MODEL_NAME) -> EmbeddingBackend:
+    """Build the named backend, falling back to the reference model if it cannot load
+    
+    The returned backend's `name` is the one that actually loaded; caches and stored
+    embeddings are keyed on it rather than on the requested backend.
+    """
+    backend_cls = EMBEDDING_BACKENDS.get(backend)
+    if backend_cls is None:
+        print(f"❌ Unknown embedding backend '{backend}', using '{SentenceTransformerBackend.name}'")
+        backend_cls = SentenceTransformerBackend
+    elif resolve_embedding_backend(backend) != backend:
+        print(f"📦 Embedding backend '{backend}' unavailable, using '{SentenceTransformerBackend.name}': "
+              f"pip install {' '.join(backend_cls.requires)}")
+        backend_cls = SentenceTransformerBackend
+    
+    try:
+        return backend_cls(model_name)
+    except ImportError as e:
+        print(f"❌ Embedding backend '{backend}' unavailable ({e}). Install onnxruntime for the onnx backend: pip install onnxruntime")
+        return SentenceTransformerBackend(model_name)
+
+def check_backend_parity(candidate: EmbeddingBackend, reference: EmbeddingBackend, texts: List[str],
+                         batch_size: int = 64) -> Dict:
+    """Report cosine drift of candidate embeddings against the reference backend"""
+    start = time.perf_counter()
+    reference_embeddings = l2_normalize(reference.encode(texts, batch_size=batch_size))
+    reference_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    candidate_embeddings = l2_normalize(candidate.encode(texts, batch_size=batch_size))
+    candidate_seconds = time.perf_counter() - start
+    
+    cosines = np.sum(reference_embeddings * candidate_embeddings, axis=1)
+    drift = 1.0 - cosines
+    
+    return {
+        "backend": candidate.name,
+        "reference": reference.name,
+        "texts": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "mean_drift": float(drift.mean()),
+        "p95_drift": float(np.percentile(drift, 95)),
+        "max_drift": float(drift.max()),
+        "reference_seconds": reference_seconds,
+        "candidate_seconds": candidate_seconds,
+        "speedup": reference_seconds / candidate_seconds if candidate_seconds else 0.0
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an embedding backend against the reference model")
+    parser.add_argument("--backend", default="int8", choices=sorted(EMBEDDING_BACKENDS))
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N corpus passages")
+    args = parser.parse_args()
+    
+    from src.vector_space.philosophy_rag import philosophy_rag
+    corpus_texts = [item['text'] for item in philosophy_rag.extract_all_content()]
+    if args.limit:
+        corpus_texts = corpus_texts[:args.limit]
+    
+    print(f"🔬 Checking {args.backend} against {SentenceTransformerBackend.name} on {len(corpus_texts)} passages...")
+    report = check_backend_parity(
+        create_embedding_backend(args.backend),
+        SentenceTransformerBackend(),
+        corpus_texts
+    )
+    
+    for key, value in report.items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value}")
@@ -0,0 +1,108 @@
+# src/vector_space/embedding_batcher.py - Micro-batching Dispatcher for Concurrent Encodes
+
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Dict, List
+from src.commonconst import EMBEDDING_MODEL, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_MAX_SIZE
+
+class EmbeddingBatcher:
+    """Queues encode requests from many threads and runs them as one model batch
+    
+    A batch is flushed when `max_batch_size` texts are waiting or `max_wait_ms`
+    has passed since the first request arrived, whichever comes first. Each
+    caller gets its own rows back through a Future.
+    """
+    
+    def __init__(self, embedding_model, max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBEDDING_BATCH_WINDOW_MS):
+        self.embedding_model = embedding_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.texts = 0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+    
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+    
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for the next batch; the Future resolves to a (len(texts), dim) array"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((list(texts), future))
+        return future
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking encode through the shared batch (direct call when batching is disabled)"""
+        if self.max_wait <= 0:
+            return np.asarray(self.embedding_model.encode(list(texts)))
+        return self.submit(texts).result()
+    
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            count = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            
+            while count < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                count += len(item[0])
+            
+            try:
+                self._flush(pending)
+            except Exception as e:
+                # One bad batch fails only its own requests; the worker keeps serving the queue
+                print(f"❌ Embedding batch dispatch failed: {e}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _flush(self, pending: List[tuple]):
+        # Claim each future; requests cancelled meanwhile (e.g. an awaiting coroutine) are dropped
+        pending = [(request_texts, future) for request_texts, future in pending if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        
+        texts = [text for request_texts, _ in pending for text in request_texts]
+        
+        try:
+            vectors = np.asarray(self.embedding_model.encode(texts, batch_size=max(len(texts), 1)))
+        except Exception as e:
+            print(f"❌ Batched encode failed: {e}")
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.texts += len(texts)
+        
+        offset = 0
+        for request_texts, future in pending:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+    
+    def stats(self) -> Dict:
+        """Batch counters (average batch size shows how much coalescing happens)"""
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "average_batch_size": self.texts / self.batches if self.batches else 0.0
+        }
+
+# Global instance
+embedding_batcher = EmbeddingBatcher(EMBEDDING_MODEL)
@@ -0,0 +1,187 @@
+# src/vector_space/embedding_cache.py - Persistent LRU Cache for Query Embeddings
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from src.commonconst import (
+    EMBEDDING_MODEL,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_PATH
+)
+from src.vector_space.embedding_utils import l2_normalize
+from src.vector_space.embedding_batcher import embedding_batcher
+
+class EmbeddingCache:
+    """Bounded LRU cache in front of the embedding model with a memory-mapped spill file
+    
+    Entries are keyed by a hash of the normalized text. `save()` writes the hot set
+    to a .npy file under DB_DIR; on the next start that file is memory-mapped and
+    rows are promoted into the in-memory LRU the first time they are hit. Saving
+    merges with the rows already on disk, so a short-lived process cannot replace
+    the hot set of a long-running one with its own few entries.
+    """
+    
+    def __init__(self, encoder: Callable, capacity: int = EMBEDDING_CACHE_SIZE,
+                 spill_path: Path = EMBEDDING_CACHE_PATH):
+        self.encoder = encoder
+        self.capacity = capacity
+        self.spill_path = Path(spill_path)
+        self.keys_path = self.spill_path.with_suffix(".keys.json")
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._spill = None
+        self._spilled: Dict[str, int] = {}
+        # Set once something was encoded since load(); save() is a no-op otherwise
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+    
+    @staticmethod
+    def make_key(text: str) -> str:
+        """Hash of the normalized text (the MiniLM tokenizer is uncased, so case is folded)"""
+        normalized = " ".join(text.lower().split())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    
+    def _lookup(self, key: str):
+        """Return a cached vector (promoting spilled rows into memory) or None"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        
+        if key in self._spilled:
+            vector = np.array(self._spill[self._spilled[key]], dtype=np.float32)
+            self._insert(key, vector)
+            return vector
+        
+        return None
+    
+    def _insert(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return normalized embeddings for texts, encoding only cache misses in one batch"""
+        keys = [self.make_key(text) for text in texts]
+        found = {}
+        
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                vector = self._lookup(key)
+                if vector is not None:
+                    found[key] = vector
+        
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            vectors = l2_normalize(self.encoder(list(missing.values())))
+            with self._lock:
+                for key, vector in zip(missing.keys(), vectors):
+                    self._insert(key, vector)
+                    found[key] = vector
+                self._dirty = True
+        
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        
+        return np.stack([found[key] for key in keys])
+    
+    def _read_spill(self) -> Optional[Tuple[List[str], np.ndarray]]:
+        """(keys, memory-mapped rows) of the spill file on disk, or None if missing or for another model"""
+        if not (self.spill_path.exists() and self.keys_path.exists()):
+            return None
+        
+        with open(self.keys_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        spill = np.load(self.spill_path, mmap_mode='r')
+        
+        if meta.get("model") != EMBEDDING_MODEL_NAME or meta.get("backend") != EMBEDDING_MODEL.backend_name or spill.shape[0] != len(meta.get("keys", [])):
+            print("🗑️ Ignoring stale embedding cache spill file")
+            return None
+        return meta["keys"], spill
+    
+    def load(self):
+        """Memory-map the spill file written by a previous run, if it matches the current model"""
+        try:
+            spilled = self._read_spill()
+            if spilled is None:
+                return
+            
+            keys, self._spill = spilled
+            self._spilled = {key: row for row, key in enumerate(keys)}
+            print(f"🧮 Embedding cache: {len(self._spilled)} spilled entries mapped")
+        except Exception as e:
+            print(f"❌ Could not load embedding cache: {e}")
+    
+    def save(self):
+        """Spill the in-memory hot set (most recent last), topped up with rows already on disk
+        
+        The file is re-read rather than trusting what load() mapped, so rows saved by
+        another process in the meantime are kept too. Nothing is written unless this
+        process encoded something new.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            keys = list(self._entries.keys())
+            vectors = list(self._entries.values())
+        
+        try:
+            spilled = self._read_spill()
+            if spilled is not None and len(keys) < self.capacity:
+                in_memory = set(keys)
+                disk_keys, disk_rows = spilled
+                # The file is ordered most recent last, so the tail is what to keep
+                kept = [row for row, key in enumerate(disk_keys) if key not in in_memory]
+                kept = kept[-(self.capacity - len(keys)):]
+                keys = [disk_keys[row] for row in kept] + keys
+                vectors = [np.array(disk_rows[row], dtype=np.float32) for row in kept] + vectors
+            vectors = np.stack(vectors)
+            
+            tmp_path = self.spill_path.with_suffix(".tmp.npy")
+            spill = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=vectors.shape)
+            spill[:] = vectors
+            spill.flush()
+            del spill
+            
+            tmp_keys_path = self.keys_path.with_suffix(".tmp")
+            with open(tmp_keys_path, 'w', encoding='utf-8') as f:
+                json.dump({"model": EMBEDDING_MODEL_NAME, "backend": EMBEDDING_MODEL.backend_name, "keys": keys}, f)
+            
+            os.replace(tmp_path, self.spill_path)
+            os.replace(tmp_keys_path, self.keys_path)
+            with self._lock:
+                self._dirty = False
+        except Exception as e:
+            print(f"❌ Could not save embedding cache: {e}")
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "spilled": len(self._spilled),
+            "capacity": self.capacity
+        }
+
+# Global instance (misses go through the micro-batcher so concurrent requests share a batch)
+embedding_cache = EmbeddingCache(embedding_batcher.encode)
+atexit.register(embedding_cache.save)
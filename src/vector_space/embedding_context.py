@@ -0,0 +1,59 @@
+# src/vector_space/embedding_context.py - Request-scoped Embedding Sharing
+
+import numpy as np
+from typing import Any, Callable, Dict, Hashable, List
+from src.vector_space.embedding_utils import l2_normalize
+
+class EmbeddingContext:
+    """Per-request memo so every pipeline stage shares one encode per distinct string
+    
+    Stages receive the same context, ask it for vectors instead of calling the
+    embedding model directly, and park intermediate results (such as the chosen
+    playlist) in `results` so later stages can reuse them.
+    """
+    
+    def __init__(self, encoder):
+        self.encoder = encoder  # anything with encode(texts), e.g. the embedding cache
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.results: Dict[Hashable, Any] = {}
+        self.encode_calls = 0
+        self.texts_encoded = 0
+        self.lookups = 0
+    
+    def prefetch(self, texts: List[str]):
+        """Encode all not-yet-seen strings in a single batched model call"""
+        missing = list(dict.fromkeys(text for text in texts if text not in self.vectors))
+        if not missing:
+            return
+        
+        vectors = l2_normalize(self.encoder.encode(missing))
+        self.encode_calls += 1
+        self.texts_encoded += len(missing)
+        for text, vector in zip(missing, vectors):
+            self.vectors[text] = vector
+    
+    def encode(self, text: str) -> np.ndarray:
+        """Return the normalized embedding for text, encoding it at most once per request"""
+        self.lookups += 1
+        self.prefetch([text])
+        return self.vectors[text]
+    
+    def encode_many(self, texts: List[str]) -> np.ndarray:
+        """Return normalized embeddings for texts as one (len(texts), dim) matrix"""
+        self.lookups += len(texts)
+        self.prefetch(texts)
+        return np.stack([self.vectors[text] for text in texts])
+    
+    def get_or_compute(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return a stage result computed earlier in this request, or compute and keep it"""
+        if key not in self.results:
+            self.results[key] = factory()
+        return self.results[key]
+    
+    def stats(self) -> Dict:
+        """Encode counters for this request"""
+        return {
+            "encode_calls": self.encode_calls,
+            "texts_encoded": self.texts_encoded,
+            "embedding_lookups": self.lookups
+        }
@@ -0,0 +1,148 @@
+# src/vector_space/embedding_store.py - Versioned On-disk Store for Corpus Embeddings
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from src.commonconst import (
+    BOOK_PATHS,
+    EMBEDDING_MODEL,
+    EMBEDDING_MODEL_NAME,
+    PHILOSOPHY_STORE_DIR,
+    RAG_DEDUP_THRESHOLD
+)
+from src.vector_space.corpus_store import CorpusColumns
+
+STORE_FORMAT_VERSION = 3
+
+class EmbeddingStore:
+    """Corpus embeddings stored as one segment per book, plus a manifest
+    
+    Each segment is a memory-mappable .npy of normalized embeddings with a column-wise
+    metadata side file (.npz, see CorpusColumns). The manifest records the format
+    version, embedding model/backend and the content hash of the book file each
+    segment was built from, so a changed book invalidates only its own segment.
+    Because embeddings are opened with mmap_mode, worker processes share the same
+    pages.
+    """
+    
+    def __init__(self, store_dir: Path = PHILOSOPHY_STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self.segments_dir = self.store_dir / "segments"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self._manifest_lock = threading.Lock()
+    
+    @staticmethod
+    def hash_file(path: Path) -> Optional[str]:
+        """SHA-256 of a file's bytes (None if it does not exist)"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def compute_book_hashes(self, book_paths: Dict[str, Path] = BOOK_PATHS) -> Dict[str, Optional[str]]:
+        return {book: self.hash_file(path) for book, path in book_paths.items()}
+    
+    def embeddings_path(self, book: str) -> Path:
+        return self.segments_dir / f"{book}.npy"
+    
+    def metadata_path(self, book: str) -> Path:
+        return self.segments_dir / f"{book}.npz"
+    
+    def index_path(self, book: str, backend: str) -> Path:
+        return self.segments_dir / f"{book}.{backend}.faiss"
+    
+    def read_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            manifest = {}
+        
+        if (manifest.get("format_version") != STORE_FORMAT_VERSION
+                or manifest.get("embedding_model") != EMBEDDING_MODEL_NAME
+                or manifest.get("embedding_backend") != EMBEDDING_MODEL.backend_name
+                or manifest.get("dedup_threshold") != RAG_DEDUP_THRESHOLD):
+            # Older format, different model or compaction setting: no segment can be reused
+            manifest = {
+                "format_version": STORE_FORMAT_VERSION,
+                "embedding_model": EMBEDDING_MODEL_NAME,
+                "embedding_backend": EMBEDDING_MODEL.backend_name,
+                "dedup_threshold": RAG_DEDUP_THRESHOLD,
+                "segments": {}
+            }
+        return manifest
+    
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+    
+    def segment_is_current(self, book: str, book_hash: Optional[str]) -> bool:
+        """True when the book's segment was built from this exact file and model"""
+        segment = self.read_manifest()["segments"].get(book)
+        return bool(
+            segment
+            and book_hash is not None
+            and segment.get("book_hash") == book_hash
+            and self.embeddings_path(book).exists()
+            and self.metadata_path(book).exists()
+        )
+    
+    def load_segment(self, book: str) -> Tuple[CorpusColumns, np.ndarray]:
+        """Return (records, embeddings) for one book with embeddings memory-mapped read-only"""
+        records = CorpusColumns.load(self.metadata_path(book))
+        embeddings = np.load(self.embeddings_path(book), mmap_mode='r')
+        return records, embeddings
+    
+    def save_segment(self, book: str, records: List[Dict], embeddings: np.ndarray, book_hash: Optional[str]):
+        """Write one book's segment; its manifest entry is updated last so a crash never looks current"""
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self._update_manifest(book, None)
+        
+        # Indexes built from the previous segment are stale
+        for index_path in self.segments_dir.glob(f"{book}.*.faiss"):
+            index_path.unlink()
+        
+        # os.replace swaps the inode, so readers still mapping the old file are unaffected
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        tmp_embeddings_path = self.segments_dir / f"{book}.tmp.npy"
+        np.save(tmp_embeddings_path, embeddings)
+        os.replace(tmp_embeddings_path, self.embeddings_path(book))
+        
+        tmp_metadata_path = self.segments_dir / f"{book}.npz.tmp"
+        with open(tmp_metadata_path, 'wb') as f:
+            CorpusColumns.from_records(records).save(f)
+        os.replace(tmp_metadata_path, self.metadata_path(book))
+        
+        self._update_manifest(book, {
+            "book_hash": book_hash,
+            "count": len(records),
+            "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0
+        })
+    
+    def remove_segment(self, book: str):
+        """Drop a book that is no longer part of the corpus"""
+        self._update_manifest(book, None)
+        for path in self.segments_dir.glob(f"{book}.*"):
+            path.unlink()
+    
+    def _update_manifest(self, book: str, entry: Optional[Dict]):
+        with self._manifest_lock:
+            manifest = self.read_manifest()
+            if entry is None:
+                manifest["segments"].pop(book, None)
+            else:
+                manifest["segments"][book] = entry
+            
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            tmp_manifest_path = self.manifest_path.with_suffix(".tmp")
+            with open(tmp_manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_manifest_path, self.manifest_path)
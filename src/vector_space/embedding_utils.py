@@ -0,0 +1,58 @@
+# src/vector_space/embedding_utils.py - Shared Embedding Helpers
+
+import threading
+import numpy as np
+from typing import Dict, List, Tuple
+
+def l2_normalize(vectors) -> np.ndarray:
+    """Return float32 rows scaled to unit length (cosine similarity becomes a dot product)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        norm = np.linalg.norm(vectors)
+        return vectors / norm if norm > 0 else vectors
+    
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class DescriptionIndex:
+    """In-memory index of normalized embeddings for a name -> description dict
+    
+    Only descriptions that are new or changed since the last sync are encoded,
+    so entries added at runtime cost one encode each instead of a full rebuild.
+    Syncs are serialized, so concurrent requests never encode the same entries
+    twice or read a matrix that is half rebuilt.
+    """
+    
+    def __init__(self, embedding_model):
+        self.embedding_model = embedding_model
+        self._entries: Dict[str, Tuple[str, np.ndarray]] = {}
+        self._names: List[str] = []
+        self._matrix = None
+        self._lock = threading.Lock()
+    
+    def sync(self, descriptions: Dict[str, str]) -> Tuple[List[str], np.ndarray]:
+        """Bring the index in line with descriptions and return (names, matrix)"""
+        with self._lock:
+            return self._sync(descriptions)
+    
+    def _sync(self, descriptions: Dict[str, str]) -> Tuple[List[str], np.ndarray]:
+        stale = [name for name in descriptions
+                 if name not in self._entries or self._entries[name][0] != descriptions[name]]
+        removed = [name for name in self._entries if name not in descriptions]
+        
+        if stale:
+            vectors = l2_normalize(self.embedding_model.encode([descriptions[name] for name in stale]))
+            for name, vector in zip(stale, vectors):
+                self._entries[name] = (descriptions[name], vector)
+        
+        for name in removed:
+            del self._entries[name]
+        
+        names = list(descriptions.keys())
+        if self._matrix is None or stale or removed or names != self._names:
+            self._names = names
+            self._matrix = (np.stack([self._entries[name][1] for name in names])
+                            if names else np.zeros((0, 0), dtype=np.float32))
+        
+        return self._names, self._matrix
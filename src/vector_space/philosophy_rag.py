@@ -1,176 +1,496 @@
 # src/application/philosophy_rag.py - Simple RAG System for Philosophy Books
 
-import json
-import pickle
+import threading
+import time
+import numpy as np
 from pathlib import Path
-from typing import List, Dict
-from sentence_transformers import util
-from src.commonconst import BOOK_PATHS, EMBEDDING_MODEL, DB_DIR
+from typing import List, Dict, Optional, Tuple
+from src.commonconst import (
+    BOOK_PATHS,
+    EMBEDDING_MODEL,
+    RAG_INDEX_BACKEND,
+    RAG_INGEST_WORKERS,
+    RAG_ENCODE_BATCH_SIZE,
+    RAG_RETRIEVAL_MODE,
+    RAG_DENSE_WEIGHT,
+    RAG_SPARSE_WEIGHT,
+    RAG_SPARSE_PREFILTER,
+    RAG_MMR_LAMBDA,
+    RAG_MMR_POOL_FACTOR,
+    RAG_CANDIDATE_MIN_SCORE,
+    RAG_DEDUP_THRESHOLD
+)
+from src.vector_space.embedding_utils import l2_normalize
+from src.vector_space.embedding_context import EmbeddingContext
+from src.vector_space.embedding_cache import embedding_cache
+from src.vector_space.vector_index import VectorIndex, BruteForceIndex, create_vector_index
+from src.vector_space.compression import CompressedIndex, compression_enabled, compression_key
+from src.vector_space.sparse_index import BM25Index
+from src.vector_space.reranking import mmr_rerank
+from src.vector_space.deduplication import compact_corpus, collapse_duplicate_hits
+from src.vector_space.embedding_store import EmbeddingStore
+from src.vector_space.corpus_store import CorpusColumns, PassageView
+from src.vector_space.candidate_tables import CandidateTables
+from src.vector_space.book_ingestion import iter_book_records, stream_record_batches
+
+class CorpusSegment:
+    """One book's records (column-wise), memory-mapped embeddings, vector index and BM25 index
+    
+    The BM25 index is only needed for hybrid retrieval, so unless one is passed in it
+    is built on first use.
+    """
+    
+    def __init__(self, book: str, records: CorpusColumns, embeddings: np.ndarray, index: VectorIndex,
+                 book_hash: Optional[str], sparse_index: Optional[BM25Index] = None):
+        self.book = book
+        self.records = records
+        self.embeddings = embeddings
+        self.index = index
+        self.book_hash = book_hash
+        self._sparse_index = sparse_index
+        self._sparse_lock = threading.Lock()
+    
+    @property
+    def sparse_index(self) -> BM25Index:
+        if self._sparse_index is None:
+            with self._sparse_lock:
+                if self._sparse_index is None:
+                    sparse_index = BM25Index()
+                    sparse_index.build(self.records.column('text'))
+                    self._sparse_index = sparse_index
+        return self._sparse_index
 
 class SimplePhilosophyRAG:
-    """Simple RAG system using sentence transformers without FAISS"""
+    """Simple RAG system using sentence transformers with per-book vector index segments"""
     
-    def __init__(self):
+    def __init__(self, index_backend: str = RAG_INDEX_BACKEND, retrieval_mode: str = RAG_RETRIEVAL_MODE):
         self.model = EMBEDDING_MODEL
-        self.content_cache_path = DB_DIR / "philosophy_content.pkl"
-        self.embeddings_cache_path = DB_DIR / "philosophy_embeddings.pkl"
-        self.content_data = []
-        self.embeddings = None
-        
+        self.index_backend = index_backend
+        # Persisted index files are named by backend plus compression settings
+        self.index_key = f"{index_backend}.{compression_key()}" if compression_enabled() else index_backend
+        self.retrieval_mode = retrieval_mode
+        # Cross-book collapsing of near-duplicate hits at query time (0 returns raw hits)
+        self.dedup_threshold = RAG_DEDUP_THRESHOLD
+        self.store = EmbeddingStore()
+        # Live corpus (book -> segment); reloads build a new dict and swap it in one assignment
+        self.segments: Dict[str, CorpusSegment] = {}
+        self._reload_lock = threading.Lock()
+        # Emotion -> query text for the precomputed emotion x book candidate tables
+        self.emotion_queries: Dict[str, str] = {}
+        self.candidate_tables = CandidateTables()
+    
+    @property
+    def content_data(self) -> List[PassageView]:
+        """All records of the live corpus in book order (read-only views)"""
+        return [record for segment in self.segments.values() for record in segment.records]
+    
+    def extract_book_content(self, book_name: str, book_path: Path) -> List[Dict]:
+        """Extract all content from one philosophy book via its registered parser"""
+        print(f"📖 Processing {book_name}...")
+        return list(iter_book_records(book_name, book_path))
+    
     def extract_all_content(self) -> List[Dict]:
         """Extract all content from philosophy books"""
         all_content = []
         
         for book_name, book_path in BOOK_PATHS.items():
-            print(f"📖 Processing {book_name}...")
-            
-            with open(book_path, 'r', encoding='utf-8') as f:
-                book_data = json.load(f)
-            
-            # Handle different book structures
-            if book_name == "analects":
-                for book_section in book_data:
-                    if isinstance(book_section, dict) and 'entries' in book_section:
-                        for entry in book_section['entries']:
-                            if 'source' in entry and 'target' in entry:
-                                all_content.append({
-                                    'text': f"{entry['source']} {entry['target']}",
-                                    'source': entry['source'],
-                                    'translation': entry['target'],
-                                    'book': book_name,
-                                    'type': 'quote'
-                                })
-                                
-            elif book_name == "mencius":
-                for chapter in book_data:
-                    if isinstance(chapter, dict) and 'contents' in chapter:
-                        for content in chapter['contents']:
-                            if 'source' in content and 'target' in content:
-                                all_content.append({
-                                    'text': f"{content['source']} {content['target']}",
-                                    'source': content['source'],
-                                    'translation': content['target'],
-                                    'book': book_name,
-                                    'type': 'quote'
-                                })
-                                
-            elif book_name == "tao_te_ching":
-                for chapter in book_data:
-                    if isinstance(chapter, dict):
-                        original = chapter.get('original', '')
-                        translation = chapter.get('translation', '')
-                        if original and translation:
-                            all_content.append({
-                                'text': f"{original} {translation}",
-                                'source': original,
-                                'translation': translation,
-                                'book': book_name,
-                                'chapter': chapter.get('chapter_number', ''),
-                                'type': 'chapter'
-                            })
-                            
-            elif book_name == "iching":
-                for hexagram in book_data:
-                    if isinstance(hexagram, dict):
-                        name = hexagram.get('hexagram_name', '')
-                        chinese = hexagram.get('hexagram_chinese', '')
-                        meaning = hexagram.get('symbolic_meaning', '')
-                        if name and meaning:
-                            all_content.append({
-                                'text': f"{name} {chinese} {meaning}",
-                                'source': f"{name} ({chinese})",
-                                'translation': meaning,
-                                'book': book_name,
-                                'type': 'hexagram'
-                            })
-                            
-            elif book_name in ["positive_psy", "social_psy"]:
-                if isinstance(book_data, dict):
-                    for category_name, category_data in book_data.items():
-                        if isinstance(category_data, dict) and 'concepts' in category_data:
-                            for concept in category_data['concepts']:
-                                if 'term' in concept and 'definition' in concept:
-                                    all_content.append({
-                                        'text': f"{concept['term']} {concept['definition']}",
-                                        'source': concept['term'],
-                                        'translation': concept['definition'],
-                                        'book': book_name,
-                                        'category': category_name,
-                                        'type': 'concept'
-                                    })
+            all_content.extend(self.extract_book_content(book_name, book_path))
         
         print(f"📚 Extracted {len(all_content)} content pieces from all books")
         return all_content
     
     def build_embeddings(self, force_rebuild: bool = False):
-        """Build or load embeddings for all content"""
-        if not force_rebuild and self.content_cache_path.exists() and self.embeddings_cache_path.exists():
-            # Load cached data
-            with open(self.content_cache_path, 'rb') as f:
-                self.content_data = pickle.load(f)
-            with open(self.embeddings_cache_path, 'rb') as f:
-                self.embeddings = pickle.load(f)
-            print(f"📚 Loaded cached embeddings for {len(self.content_data)} documents")
+        """Build or load embeddings for all content (only changed books are re-encoded)"""
+        if not force_rebuild and self.segments:
+            # Already loaded in this process
             return
         
-        # Extract content and create embeddings
-        self.content_data = self.extract_all_content()
+        self.reload_books(force_rebuild=force_rebuild)
+        total = sum(len(segment.records) for segment in self.segments.values())
+        print(f"📚 Philosophy corpus ready: {total} documents in {len(self.segments)} books")
+    
+    def reload_books(self, books: Optional[List[str]] = None, force_rebuild: bool = False) -> List[str]:
+        """Rebuild segments whose book file changed and swap them into the live corpus atomically
         
-        if not self.content_data:
-            print("❌ No content found")
+        Queries that are already running keep the corpus they started with; the new
+        segments become visible in a single reference assignment. Returns the books
+        that were (re)loaded.
+        """
+        with self._reload_lock:
+            live = self.segments
+            book_hashes = self.store.compute_book_hashes()
+            segments = dict(live)
+            
+            # Books whose live segment is missing or built from a different file version
+            candidates = []
+            for book in (books or list(BOOK_PATHS)):
+                if book not in BOOK_PATHS:
+                    continue
+                if book_hashes[book] is None:
+                    print(f"❌ Book file missing: {BOOK_PATHS[book]}")
+                    segments.pop(book, None)
+                    continue
+                current = live.get(book)
+                if force_rebuild or current is None or current.book_hash != book_hashes[book]:
+                    candidates.append(book)
+            
+            # Only books without a current stored segment are parsed and re-encoded
+            to_encode = {book: BOOK_PATHS[book] for book in candidates
+                         if force_rebuild or not self.store.segment_is_current(book, book_hashes[book])}
+            encoded = self._ingest_books(to_encode, book_hashes)
+            
+            reloaded = []
+            for book in candidates:
+                if book in to_encode and book not in encoded:
+                    continue  # ingestion failed: keep serving the previous segment, if any
+                segments[book] = self._load_segment(book, book_hashes[book], rebuilt=book in encoded)
+                reloaded.append(book)
+            
+            for book in list(segments):
+                if book not in BOOK_PATHS:
+                    del segments[book]
+                    self.store.remove_segment(book)
+            
+            self.segments = {book: segments[book] for book in BOOK_PATHS if book in segments}
+            self._refresh_candidate_tables()
+            return reloaded
+    
+    def build_candidate_tables(self, emotion_queries: Dict[str, str]):
+        """Precompute the top passages for every emotion and book (reused while the manifest is unchanged)"""
+        self.emotion_queries = dict(emotion_queries)
+        if not self.segments:
+            self.build_embeddings()
+        with self._reload_lock:
+            self._refresh_candidate_tables()
+    
+    def _refresh_candidate_tables(self):
+        """Load or regenerate candidate tables for the live corpus (caller holds the reload lock)"""
+        if not self.emotion_queries or self.candidate_tables.size <= 0 or not self.segments:
             return
         
-        print("🔨 Creating embeddings...")
-        texts = [item['text'] for item in self.content_data]
-        self.embeddings = self.model.encode(texts, show_progress_bar=True)
+        tables = self.candidate_tables
+        signature = tables.compute_signature(self.store.read_manifest(), self.emotion_queries)
+        path = self.store.store_dir / "candidate_tables.npz"
+        if tables.signature == signature:
+            return
         
-        # Cache the results
-        with open(self.content_cache_path, 'wb') as f:
-            pickle.dump(self.content_data, f)
-        with open(self.embeddings_cache_path, 'wb') as f:
-            pickle.dump(self.embeddings, f)
+        if not tables.load(path, signature):
+            emotions = list(self.emotion_queries)
+            emotion_matrix = l2_normalize(self.model.encode([self.emotion_queries[emotion] for emotion in emotions]))
+            tables.build(path, self.segments, emotions, emotion_matrix, signature)
+            print(f"🗂️ Built candidate tables: {len(emotions)} emotions x {len(self.segments)} books")
+        tables.record_baseline(self._time_full_search())
+    
+    def _time_full_search(self, probes: int = 3, top_k: int = 10) -> float:
+        """Average seconds of a one-query full-index search, probed with stored passage vectors
         
-        print(f"✅ Built embeddings for {len(self.content_data)} documents")
+        Gives the candidate tables a latency to compare against even when every query
+        hits them and no real full search is ever timed.
+        """
+        segments = [segment for segment in self.segments.values() if len(segment.records)][:probes]
+        if not segments:
+            return 0.0
+        
+        started = time.perf_counter()
+        for segment in segments:
+            probe = np.asarray(segment.embeddings[:1], dtype=np.float32)
+            if self.retrieval_mode == "hybrid":
+                self._hybrid_hits(self.segments, [segment.records[0].get('text', '')], probe, top_k)
+            else:
+                self._search_hits(self.segments, probe, top_k)
+        return (time.perf_counter() - started) / len(segments)
+    
+    def start_book_watcher(self, interval: float) -> threading.Thread:
+        """Poll book file modification times and hot-reload books that change"""
+        def watch():
+            mtimes = {book: path.stat().st_mtime for book, path in BOOK_PATHS.items() if path.exists()}
+            while True:
+                time.sleep(interval)
+                current = {book: path.stat().st_mtime for book, path in BOOK_PATHS.items() if path.exists()}
+                changed = [book for book in current if current[book] != mtimes.get(book)]
+                mtimes = current
+                if changed:
+                    print(f"♻️ Reloading changed books: {', '.join(changed)}")
+                    try:
+                        self.reload_books(changed)
+                    except Exception as e:
+                        print(f"❌ Book reload failed: {e}")
+        
+        thread = threading.Thread(target=watch, name="philosophy-book-watcher", daemon=True)
+        thread.start()
+        return thread
     
-    def search_relevant_content(self, query: str, top_k: int = 5, min_score: float = 0.3) -> List[Dict]:
-        """Search for most relevant content"""
-        if self.embeddings is None or not self.content_data:
+    def _ingest_books(self, book_paths: Dict[str, Path], book_hashes: Dict[str, Optional[str]]) -> List[str]:
+        """Parse books in parallel and encode their records batch by batch as they stream in
+        
+        Returns the books whose new segment was written to the store.
+        """
+        if not book_paths:
+            return []
+        
+        print(f"🔨 Ingesting {len(book_paths)} book(s): {', '.join(book_paths)}")
+        records = {book: [] for book in book_paths}
+        embeddings = {book: [] for book in book_paths}
+        saved = []
+        
+        for book, batch, error in stream_record_batches(book_paths, RAG_ENCODE_BATCH_SIZE, RAG_INGEST_WORKERS):
+            if batch is not None:
+                records[book].extend(batch)
+                embeddings[book].append(l2_normalize(self.model.encode(
+                    [item['text'] for item in batch], batch_size=64
+                )))
+                continue
+            
+            if error:
+                print(f"❌ Failed to ingest {book}: {error}")
+            elif not records[book]:
+                print(f"❌ No content found in {book}")
+            else:
+                book_records, book_embeddings = records[book], np.vstack(embeddings[book])
+                if RAG_DEDUP_THRESHOLD > 0:
+                    # Near-duplicate passages are folded into one representative with aliases
+                    book_records, book_embeddings = compact_corpus(book_records, book_embeddings, RAG_DEDUP_THRESHOLD)
+                folded = len(records[book]) - len(book_records)
+                self.store.save_segment(book, book_records, book_embeddings, book_hashes[book])
+                print(f"✅ Built embeddings for {len(book_records)} {book} documents"
+                      + (f" ({folded} near-duplicates kept as aliases)" if folded else ""))
+                saved.append(book)
+            records[book] = embeddings[book] = None
+        
+        return saved
+    
+    def _load_segment(self, book: str, book_hash: str, rebuilt: bool) -> CorpusSegment:
+        """Serve a stored segment memory-mapped (shared across worker processes) with its index"""
+        records, embeddings = self.store.load_segment(book)
+        index = self._load_or_build_index(embeddings, self.store.index_path(book, self.index_key), rebuilt)
+        segment = CorpusSegment(book, records, embeddings, index, book_hash)
+        if self.retrieval_mode == "hybrid" or RAG_SPARSE_PREFILTER > 0:
+            # Build BM25 up front so the first hybrid query does not pay for it
+            segment.sparse_index
+        return segment
+    
+    def _load_or_build_index(self, embeddings: np.ndarray, path: Path, force_rebuild: bool) -> VectorIndex:
+        """Reuse a persisted index of the right size, otherwise build (and persist) a new one"""
+        index = CompressedIndex(self.index_backend) if compression_enabled() else create_vector_index(self.index_backend)
+        
+        try:
+            if (not force_rebuild and index.persistent and index.load(path)
+                    and len(index) == len(embeddings)):
+                index.attach(embeddings)
+                return index
+            
+            index.build(embeddings)
+            if index.persistent:
+                index.save(path)
+            return index
+        except Exception as e:
+            print(f"❌ Vector index failed ({e}), falling back to brute force")
+            index = BruteForceIndex()
+            index.build(embeddings)
+            return index
+    
+    def _search_hits(self, segments: Dict[str, CorpusSegment], query_embeddings: np.ndarray, top_k: int,
+                     books: Optional[List[str]] = None) -> List[List[Tuple[CorpusSegment, int, float]]]:
+        """Return (segment, row, score) hits per query, scanning only the requested books' segments"""
+        hits = [[] for _ in range(len(query_embeddings))]
+        for book in (books if books is not None else list(segments)):
+            segment = segments.get(book)
+            if segment is None:
+                continue
+            scores, ids = segment.index.search(query_embeddings, top_k)
+            for query_hits, row_ids, row_scores in zip(hits, ids.tolist(), scores.tolist()):
+                query_hits.extend((segment, row, score) for row, score in zip(row_ids, row_scores) if row >= 0)
+        
+        for query_hits in hits:
+            query_hits.sort(key=lambda hit: hit[2], reverse=True)
+            del query_hits[top_k:]
+        return hits
+    
+    def _candidate_hits(self, segments: Dict[str, CorpusSegment], queries: List[str], query_embeddings: np.ndarray,
+                        top_k: int, candidate_rows: Dict[str, np.ndarray]) -> List[List[Tuple[CorpusSegment, int, float]]]:
+        """Return (segment, row, score) hits per query, scoring only the given rows of each book"""
+        if self.retrieval_mode == "hybrid":
+            return self._hybrid_hits(segments, queries, query_embeddings, top_k, list(candidate_rows), candidate_rows)
+        
+        hits = [[] for _ in range(len(query_embeddings))]
+        for book, rows in candidate_rows.items():
+            segment = segments[book]
+            scores = query_embeddings @ np.asarray(segment.embeddings[rows], dtype=np.float32).T
+            for query_hits, row_scores in zip(hits, scores.tolist()):
+                query_hits.extend(zip([segment] * len(rows), rows.tolist(), row_scores))
+        
+        for query_hits in hits:
+            query_hits.sort(key=lambda hit: hit[2], reverse=True)
+            del query_hits[top_k:]
+        return hits
+    
+    def _hybrid_hits(self, segments: Dict[str, CorpusSegment], queries: List[str], query_embeddings: np.ndarray,
+                     top_k: int, books: Optional[List[str]] = None,
+                     candidate_rows: Optional[Dict[str, np.ndarray]] = None) -> List[List[Tuple[CorpusSegment, int, float]]]:
+        """Return (segment, row, fused score) hits per query from dense and BM25 candidates
+        
+        fused = RAG_DENSE_WEIGHT * cosine + RAG_SPARSE_WEIGHT * BM25 / best BM25 for the query,
+        so passages sharing rare exact terms are lifted without penalising pure semantic
+        matches. With RAG_SPARSE_PREFILTER > 0 only the top BM25 rows are scored densely
+        (the full dense index is used when no query term occurs in a book). Given
+        candidate_rows, only those rows of each book are scored.
+        """
+        searched = [segments[book] for book in (books if books is not None else list(segments)) if book in segments]
+        candidate_count = max(top_k * 4, RAG_SPARSE_PREFILTER)
+        hits = []
+        
+        for query, query_embedding in zip(queries, query_embeddings):
+            sparse = {}
+            for segment in searched:
+                sparse[segment.book] = segment.sparse_index.score(query)
+            best_sparse = max((scores.max() for _, scores in sparse.values() if len(scores)), default=0.0)
+            
+            query_hits = []
+            for segment in searched:
+                rows, sparse_scores = sparse.get(segment.book, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+                if candidate_rows is not None:
+                    candidates = set(candidate_rows[segment.book].tolist())
+                elif len(rows) > candidate_count:
+                    keep = np.argpartition(-sparse_scores, candidate_count - 1)[:candidate_count]
+                    candidates = set(rows[keep].tolist())
+                else:
+                    candidates = set(rows.tolist())
+                
+                if candidate_rows is None and (RAG_SPARSE_PREFILTER <= 0 or not candidates):
+                    _, ids = segment.index.search(query_embedding[None, :], candidate_count)
+                    candidates.update(row for row in ids[0].tolist() if row >= 0)
+                if not candidates:
+                    continue
+                
+                # Normalized BM25 for every matching row, so dense-only candidates keep their term score too
+                sparse_row_scores = np.zeros(len(segment.records), dtype=np.float32)
+                if best_sparse:
+                    sparse_row_scores[rows] = sparse_scores / best_sparse
+                
+                scored_rows = np.fromiter(sorted(candidates), dtype=np.int64)
+                dense_scores = np.asarray(segment.embeddings[scored_rows], dtype=np.float32) @ query_embedding
+                fused = RAG_DENSE_WEIGHT * dense_scores + RAG_SPARSE_WEIGHT * sparse_row_scores[scored_rows]
+                query_hits.extend(zip([segment] * len(scored_rows), scored_rows.tolist(), fused.tolist()))
+            
+            query_hits.sort(key=lambda hit: hit[2], reverse=True)
+            hits.append(query_hits[:top_k])
+        return hits
+    
+    def _lookup_candidates(self, segments: Dict[str, CorpusSegment], emotion: Optional[str],
+                           books: Optional[List[str]]) -> Optional[Dict[str, np.ndarray]]:
+        """Candidate rows per searched book, or None if any book has no table for this emotion"""
+        if not emotion or not self.candidate_tables.tables:
+            return None
+        
+        candidate_rows = {}
+        for book in (books if books is not None else list(segments)):
+            segment = segments.get(book)
+            if segment is None:
+                continue
+            rows = self.candidate_tables.lookup(emotion, segment)
+            if rows is None:
+                return None
+            candidate_rows[book] = rows
+        return candidate_rows or None
+    
+    def search_many(self, queries: List[str], top_k: int = 5, min_score: float = 0.3,
+                    books: Optional[List[str]] = None,
+                    context: Optional[EmbeddingContext] = None,
+                    mmr: bool = False, mmr_lambda: float = RAG_MMR_LAMBDA,
+                    emotion: Optional[str] = None) -> List[PassageView]:
+        """Search several queries at once and return the best hits deduplicated by document id
+        
+        All queries are encoded in one batch and scored in one matrix multiply per
+        segment (plus BM25 fusion in hybrid mode). Each document appears once, with
+        the best score any query gave it. With mmr=True a larger candidate pool is
+        re-ranked by maximal marginal relevance to drop near-duplicate passages. Given
+        the detected emotion, only that emotion's precomputed candidates are scored
+        unless they score below RAG_CANDIDATE_MIN_SCORE. In hybrid mode both min_score
+        and that fallback threshold compare against the fused dense + BM25 score.
+        """
+        if not self.segments:
             self.build_embeddings()
         
-        if self.embeddings is None:
+        # Pin the live corpus for this query so a concurrent reload cannot change it mid-search
+        segments = self.segments
+        if not segments or not queries:
             return []
         
-        # Create query embedding
-        query_embedding = self.model.encode([query])
+        # Create query embeddings in one batch
+        query_embeddings = (context or EmbeddingContext(embedding_cache)).encode_many(queries)
+        
+        # Keep the best score per document across all queries
+        best_hits: Dict[str, Tuple[CorpusSegment, int, float]] = {}
+        # Over-fetch so MMR and cross-book duplicate collapsing still leave top_k hits
+        fetch_k = top_k * (max(RAG_MMR_POOL_FACTOR, 1) if mmr else 2 if self.dedup_threshold > 0 else 1)
+        query_hits_list = None
+        
+        candidate_rows = self._lookup_candidates(segments, emotion, books)
+        if candidate_rows is not None:
+            started = time.perf_counter()
+            query_hits_list = self._candidate_hits(segments, queries, query_embeddings, fetch_k, candidate_rows)
+            hit = all(query_hits and query_hits[0][2] >= RAG_CANDIDATE_MIN_SCORE for query_hits in query_hits_list)
+            self.candidate_tables.record_candidate(time.perf_counter() - started, hit)
+            if not hit:
+                query_hits_list = None
         
-        # Calculate similarities
-        similarities = util.cos_sim(query_embedding, self.embeddings)[0]
+        if query_hits_list is None:
+            started = time.perf_counter()
+            if self.retrieval_mode == "hybrid":
+                query_hits_list = self._hybrid_hits(segments, queries, query_embeddings, fetch_k, books)
+            else:
+                query_hits_list = self._search_hits(segments, query_embeddings, fetch_k, books)
+            self.candidate_tables.record_full(time.perf_counter() - started)
         
-        # Get top results
-        top_indices = similarities.topk(min(top_k, len(similarities))).indices.tolist()
+        for query_hits in query_hits_list:
+            for segment, row, score in query_hits:
+                doc_id = f"{segment.book}:{row}"
+                if score >= min_score and (doc_id not in best_hits or score > best_hits[doc_id][2]):
+                    best_hits[doc_id] = (segment, row, score)
         
-        results = []
-        for idx in top_indices:
-            score = float(similarities[idx])
-            if score >= min_score:
-                result = self.content_data[idx].copy()
-                result['relevance_score'] = score
-                results.append(result)
+        ranked = sorted(best_hits.items(), key=lambda hit: hit[1][2], reverse=True)[:fetch_k]
+        if len(ranked) <= 1:
+            candidate_embeddings = None
+        else:
+            candidate_embeddings = np.vstack([segment.embeddings[row] for _, (segment, row, _) in ranked])
         
-        return results
+        # Books are compacted one by one, so the same teaching can still come from two books
+        duplicate_ids: Dict[str, List[str]] = {}
+        if self.dedup_threshold > 0 and candidate_embeddings is not None:
+            kept = collapse_duplicate_hits(candidate_embeddings, self.dedup_threshold)
+            for position, duplicates in kept.items():
+                if duplicates:
+                    duplicate_ids[ranked[position][0]] = [ranked[duplicate][0] for duplicate in duplicates]
+            positions = list(kept)
+            ranked = [ranked[position] for position in positions]
+            candidate_embeddings = candidate_embeddings[positions]
+        
+        if mmr and len(ranked) > top_k:
+            relevance = np.array([score for _, (_, _, score) in ranked], dtype=np.float32)
+            ranked = [ranked[i] for i in mmr_rerank(candidate_embeddings, relevance, top_k, mmr_lambda)]
+        
+        # Views read straight from the segment columns; nothing is copied per hit
+        return [segment.records.view(row, doc_id, score, duplicate_ids.get(doc_id))
+                for doc_id, (segment, row, score) in ranked[:top_k]]
+    
+    def search_relevant_content(self, query: str, top_k: int = 5, min_score: float = 0.3,
+                                books: Optional[List[str]] = None,
+                                context: Optional[EmbeddingContext] = None,
+                                mmr: bool = False, mmr_lambda: float = RAG_MMR_LAMBDA,
+                                emotion: Optional[str] = None) -> List[PassageView]:
+        """Search for most relevant content, optionally restricted to the given books"""
+        return self.search_many([query], top_k=top_k, min_score=min_score, books=books, context=context,
+                                mmr=mmr, mmr_lambda=mmr_lambda, emotion=emotion)
     
     def get_statistics(self) -> Dict:
         """Get statistics about the content database"""
-        if not self.content_data:
+        if not self.segments:
             self.build_embeddings()
         
-        book_counts = {}
-        for item in self.content_data:
-            book = item['book']
-            book_counts[book] = book_counts.get(book, 0) + 1
+        book_counts = {book: len(segment.records) for book, segment in self.segments.items()}
         
         return {
-            "total_documents": len(self.content_data),
+            "total_documents": sum(book_counts.values()),
             "books": book_counts
         }
 
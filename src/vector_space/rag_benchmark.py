@@ -0,0 +1,259 @@
+# src/vector_space/rag_benchmark.py - Retrieval Quality and Latency Benchmark for philosophy_rag
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import csv
+import gc
+import json
+import time
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+from collections import defaultdict
+from typing import Dict, List
+from src.commonconst import (
+    DB_DIR,
+    CSV_EXPORT_PATH,
+    EMBEDDING_MODEL,
+    EMBEDDING_MODEL_NAME,
+    RAG_IVF_NLIST,
+    RAG_IVF_NPROBE,
+    RAG_HNSW_M,
+    RAG_HNSW_EF_SEARCH,
+    RAG_COMPRESSION,
+    RAG_COMPRESSED_DIM,
+    RAG_VECTOR_DTYPE
+)
+from src.vector_space.embedding_context import EmbeddingContext
+from src.vector_space.embedding_cache import embedding_cache
+from src.vector_space.vector_index import create_vector_index
+from src.vector_space.compression import CompressedIndex
+
+BENCHMARK_DIR = DB_DIR / "benchmarks"
+
+# name -> (index backend, retrieval mode)
+BENCHMARK_VARIANTS = {
+    "brute": ("brute", "dense"),
+    "flat": ("flat", "dense"),
+    "ivf": ("ivf", "dense"),
+    "hnsw": ("hnsw", "dense"),
+    "hybrid": ("flat", "hybrid"),
+    "compressed": ("flat", "dense")  # RAG_COMPRESSION / RAG_VECTOR_DTYPE, PCA + float16 when unset
+}
+
+def create_benchmark_index(name: str, index_backend: str):
+    if name != "compressed":
+        return create_vector_index(index_backend)
+    return CompressedIndex(
+        index_backend,
+        compression="pca" if RAG_COMPRESSION == "none" else RAG_COMPRESSION,
+        dim=RAG_COMPRESSED_DIM,
+        dtype="float16" if RAG_VECTOR_DTYPE == "float32" else RAG_VECTOR_DTYPE
+    )
+
+def build_query_set(emotion_profiles: Dict, history_path: Path = CSV_EXPORT_PATH,
+                    history_limit: int = 200) -> List[Dict]:
+    """Labeled queries from emotion profile keywords plus replayed user history"""
+    queries = []
+    for emotion, profile in emotion_profiles.items():
+        for keyword in profile['keywords']:
+            queries.append({"query": f"I feel {keyword}", "emotion": emotion, "origin": "profile"})
+    
+    if history_path.exists():
+        with open(history_path, 'r', newline='', encoding='utf-8') as csvfile:
+            history = [row for row in csv.DictReader(csvfile) if row.get('User Input')]
+        for row in history[-history_limit:] if history_limit else history:
+            queries.append({
+                "query": row['User Input'],
+                "emotion": row.get('Detected Emotion', ''),
+                "book": row.get('Philosophy Book', ''),
+                "origin": "history"
+            })
+    
+    return queries
+
+def resident_memory_mb() -> float:
+    """Current resident set size of this process"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # peak, in KB on Linux
+
+def exact_top_k(segments: Dict, query_embeddings: np.ndarray, k: int) -> List[List[str]]:
+    """Ground truth: exhaustive cosine search over every passage"""
+    doc_ids = [f"{book}:{row}" for book, segment in segments.items() for row in range(len(segment.records))]
+    corpus = np.vstack([np.asarray(segment.embeddings, dtype=np.float32) for segment in segments.values()])
+    scores = query_embeddings @ corpus.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return [[doc_ids[i] for i in row] for row in top]
+
+def recall_by_label(query_set: List[Dict], recalls: List[float], label: str) -> Dict[str, float]:
+    """Mean recall per value of one query label (queries without it are left out)"""
+    grouped = defaultdict(list)
+    for item, recall in zip(query_set, recalls):
+        if item.get(label):
+            grouped[item[label]].append(recall)
+    return {value: float(np.mean(values)) for value, values in sorted(grouped.items())}
+
+def benchmark_variant(name: str, base_rag, query_set: List[Dict], context: EmbeddingContext,
+                      truth: List[List[str]], k: int) -> Dict:
+    """Build one index variant over the loaded segments, then time and score every query
+    
+    Hit collapsing is turned off, since the exact ground truth is not collapsed either.
+    """
+    from src.vector_space.philosophy_rag import SimplePhilosophyRAG, CorpusSegment
+    
+    index_backend, retrieval_mode = BENCHMARK_VARIANTS[name]
+    gc.collect()
+    memory_before = resident_memory_mb()
+    
+    build_seconds = 0.0
+    segments = {}
+    for book, segment in base_rag.segments.items():
+        index = create_benchmark_index(name, index_backend)
+        started = time.perf_counter()
+        index.build(np.asarray(segment.embeddings, dtype=np.float32))
+        build_seconds += time.perf_counter() - started
+        # Dense variants leave BM25 unbuilt; the hybrid one shares (or builds) the live segment's
+        sparse_index = segment.sparse_index if retrieval_mode == "hybrid" else None
+        segments[book] = CorpusSegment(book, segment.records, segment.embeddings, index,
+                                       segment.book_hash, sparse_index)
+    memory_after = resident_memory_mb()
+    
+    rag = SimplePhilosophyRAG(index_backend, retrieval_mode)
+    rag.store = base_rag.store
+    rag.segments = segments
+    rag.dedup_threshold = 0.0
+    
+    latencies = []
+    recalls = []
+    for item, expected in zip(query_set, truth):
+        query = item['query']
+        started = time.perf_counter()
+        results = rag.search_many([query], top_k=k, min_score=-1.0, context=context)
+        latencies.append(time.perf_counter() - started)
+        found = {result['doc_id'] for result in results}
+        recalls.append(len(found & set(expected)) / len(expected) if expected else 1.0)
+    
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "index_backend": index_backend,
+        "retrieval_mode": retrieval_mode,
+        "recall_at_k": float(np.mean(recalls)),
+        "recall_by_emotion": recall_by_label(query_set, recalls, "emotion"),
+        "recall_by_book": recall_by_label(query_set, recalls, "book"),
+        "recall_by_origin": recall_by_label(query_set, recalls, "origin"),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        "build_seconds": build_seconds,
+        "index_memory_mb": max(0.0, memory_after - memory_before),
+        "resident_memory_mb": memory_after
+    }
+
+def run_benchmark(variants: List[str], k: int = 5, history_limit: int = 200) -> Dict:
+    from src.modeling.simple_emotion_model import simple_emotion_classifier
+    from src.vector_space.philosophy_rag import philosophy_rag
+    
+    philosophy_rag.build_embeddings()
+    query_set = build_query_set(simple_emotion_classifier.emotion_profiles, history_limit=history_limit)
+    queries = [item['query'] for item in query_set]
+    
+    # Encode once up front so every variant measures retrieval only
+    context = EmbeddingContext(embedding_cache)
+    context.prefetch(queries)
+    truth = exact_top_k(philosophy_rag.segments, context.encode_many(queries), k)
+    
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "config": {
+            "embedding_model": EMBEDDING_MODEL_NAME,
+            "embedding_backend": EMBEDDING_MODEL.backend_name,
+            "k": k,
+            "queries": len(queries),
+            "profile_queries": sum(item['origin'] == "profile" for item in query_set),
+            "history_queries": sum(item['origin'] == "history" for item in query_set),
+            "documents": sum(len(segment.records) for segment in philosophy_rag.segments.values()),
+            "ivf_nlist": RAG_IVF_NLIST,
+            "ivf_nprobe": RAG_IVF_NPROBE,
+            "hnsw_m": RAG_HNSW_M,
+            "hnsw_ef_search": RAG_HNSW_EF_SEARCH
+        },
+        "results": {}
+    }
+    
+    for name in variants:
+        print(f"⏱️ Benchmarking {name}...")
+        try:
+            report["results"][name] = benchmark_variant(name, philosophy_rag, query_set, context, truth, k)
+        except Exception as e:
+            print(f"❌ {name} failed: {e}")
+            report["results"][name] = {"error": str(e)}
+    
+    return report
+
+def compare_reports(baseline: Dict, candidate: Dict) -> List[str]:
+    """Per-variant metric deltas between two benchmark files"""
+    lines = []
+    for name, metrics in candidate["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous or "error" in metrics or "error" in previous:
+            lines.append(f"{name}: not comparable")
+            continue
+        for metric, value in metrics.items():
+            if isinstance(value, float) and isinstance(previous.get(metric), float):
+                lines.append(f"{name:8} {metric:20} {previous[metric]:10.4f} -> {value:10.4f} ({value - previous[metric]:+.4f})")
+    return lines
+
+def print_report(report: Dict):
+    print(f"\n{'variant':8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'build s':>8} {'mem MB':>8}")
+    for name, metrics in report["results"].items():
+        if "error" in metrics:
+            print(f"{name:8} error: {metrics['error']}")
+            continue
+        print(f"{name:8} {metrics['recall_at_k']:9.3f} {metrics['p50_ms']:8.2f} {metrics['p95_ms']:8.2f} "
+              f"{metrics['p99_ms']:8.2f} {metrics['build_seconds']:8.3f} {metrics['index_memory_mb']:8.1f}")
+    
+    for name, metrics in report["results"].items():
+        if metrics.get("recall_by_emotion"):
+            print(f"\n{name} recall@k by emotion: " + ", ".join(
+                f"{emotion} {recall:.3f}" for emotion, recall in metrics["recall_by_emotion"].items()
+            ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark philosophy retrieval quality and latency per index backend")
+    parser.add_argument("--variants", nargs="+", default=list(BENCHMARK_VARIANTS), choices=list(BENCHMARK_VARIANTS))
+    parser.add_argument("--k", type=int, default=5, help="Results per query for recall@k")
+    parser.add_argument("--history-limit", type=int, default=200, help="Most recent history rows to replay (0 = all)")
+    parser.add_argument("--output", type=Path, help="Where to write the JSON report")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BASELINE", "CANDIDATE"),
+                        help="Diff two existing reports instead of running")
+    args = parser.parse_args()
+    
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, 'r', encoding='utf-8') as f:
+                reports.append(json.load(f))
+        print("\n".join(compare_reports(*reports)))
+        sys.exit(0)
+    
+    report = run_benchmark(args.variants, k=args.k, history_limit=args.history_limit)
+    print_report(report)
+    
+    output = args.output or BENCHMARK_DIR / f"rag_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Benchmark written to {output}")
@@ -0,0 +1,35 @@
+# src/vector_space/reranking.py - Maximal Marginal Relevance Re-ranking
+
+import numpy as np
+from typing import List
+
+def mmr_rerank(embeddings: np.ndarray, relevance: np.ndarray, top_k: int,
+               diversity_lambda: float = 0.7) -> List[int]:
+    """Pick top_k candidate positions by maximal marginal relevance
+    
+    Each step selects argmax(lambda * relevance - (1 - lambda) * max similarity to the
+    already selected candidates). Pairwise similarities come from one matrix multiply
+    of the (L2-normalized) candidate embeddings and the running maximum is updated with
+    one vector operation per pick.
+    """
+    count = len(relevance)
+    if count == 0 or top_k <= 0:
+        return []
+    
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = embeddings @ embeddings.T
+    
+    max_similarity = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected = []
+    
+    for _ in range(min(top_k, count)):
+        marginal = diversity_lambda * relevance - (1.0 - diversity_lambda) * max_similarity
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    
+    return selected
@@ -0,0 +1,75 @@
+# src/vector_space/sparse_index.py - Compact BM25 Inverted Index for Hybrid Retrieval
+
+import re
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Latin words/numbers, plus single CJK characters for the original-language passages
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[一-鿿]")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """Okapi BM25 over array-backed postings (CSR layout: one offsets array per vocabulary)
+    
+    Postings for term t are postings_docs[offsets[t]:offsets[t + 1]] with matching
+    term frequencies in postings_tf, so the whole index is four flat NumPy arrays
+    plus the vocabulary dict.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings_docs = np.zeros(0, dtype=np.int32)
+        self.postings_tf = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.average_length = 0.0
+    
+    def build(self, texts: List[str]):
+        term_ids, doc_ids, frequencies = [], [], []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                frequencies.append(count)
+        
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.postings_docs = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.postings_tf = np.asarray(frequencies, dtype=np.float32)[order]
+        
+        document_frequency = np.bincount(term_ids, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate([[0], np.cumsum(document_frequency)]).astype(np.int64)
+        self.idf = np.log(1.0 + (len(texts) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        self.doc_lengths = doc_lengths
+        self.average_length = float(doc_lengths.mean()) if len(texts) else 0.0
+    
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (doc ids, BM25 scores) for every document sharing at least one query term"""
+        term_ids = {self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary}
+        if not term_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        length_norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths / max(self.average_length, 1e-9))
+        
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + length_norm[docs])
+        
+        doc_ids = np.flatnonzero(scores)
+        return doc_ids, scores[doc_ids]
+    
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
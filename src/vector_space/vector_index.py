@@ -0,0 +1,171 @@
+# src/vector_space/vector_index.py - Vector Index Backends for Philosophy RAG
+
+import numpy as np
+from pathlib import Path
+from typing import Tuple
+from src.commonconst import (
+    RAG_INDEX_BACKEND,
+    RAG_IVF_NLIST,
+    RAG_IVF_NPROBE,
+    RAG_HNSW_M,
+    RAG_HNSW_EF_SEARCH
+)
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+class VectorIndex:
+    """Inner-product index over unit-normalized vectors, so scores are cosine similarities
+    
+    `search` takes a (num_queries, dim) matrix and returns (scores, ids) arrays of
+    shape (num_queries, top_k); missing slots have id -1.
+    """
+    
+    backend = "base"
+    persistent = False
+    
+    def build(self, embeddings: np.ndarray):
+        raise NotImplementedError
+    
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+    
+    def save(self, path: Path):
+        pass
+    
+    def load(self, path: Path) -> bool:
+        return False
+    
+    def attach(self, embeddings: np.ndarray):
+        """Called after load() with the segment's full-precision embeddings"""
+        pass
+    
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+class BruteForceIndex(VectorIndex):
+    """Exact NumPy matrix product against every vector (no dependencies, always available)"""
+    
+    backend = "brute"
+    
+    def __init__(self):
+        self.embeddings = None
+    
+    def build(self, embeddings: np.ndarray):
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+    
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n = len(self)
+        k = min(top_k, n)
+        if k <= 0:
+            return (np.zeros((len(queries), 0), dtype=np.float32),
+                    np.zeros((len(queries), 0), dtype=np.int64))
+        
+        scores = queries @ self.embeddings.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+    
+    def __len__(self) -> int:
+        return 0 if self.embeddings is None else len(self.embeddings)
+
+class FaissIndex(VectorIndex):
+    """Common FAISS plumbing: build, search and persistence via write_index/read_index"""
+    
+    persistent = True
+    
+    def __init__(self):
+        self.index = None
+    
+    def _create(self, dim: int, count: int):
+        raise NotImplementedError
+    
+    def _configure(self):
+        """Apply search-time parameters (also needed after loading from disk)"""
+        pass
+    
+    def build(self, embeddings: np.ndarray):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.index = self._create(embeddings.shape[1], len(embeddings))
+        if not self.index.is_trained:
+            self.index.train(embeddings)
+        self.index.add(embeddings)
+        self._configure()
+    
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        k = min(top_k, len(self))
+        if k <= 0:
+            return (np.zeros((len(queries), 0), dtype=np.float32),
+                    np.zeros((len(queries), 0), dtype=np.int64))
+        return self.index.search(queries, k)
+    
+    def save(self, path: Path):
+        faiss.write_index(self.index, str(path))
+    
+    def load(self, path: Path) -> bool:
+        if not Path(path).exists():
+            return False
+        self.index = faiss.read_index(str(path))
+        self._configure()
+        return True
+    
+    def __len__(self) -> int:
+        return 0 if self.index is None else self.index.ntotal
+
+class FaissFlatIndex(FaissIndex):
+    """Exact inner-product search (same results as brute force, faster kernels)"""
+    
+    backend = "flat"
+    
+    def _create(self, dim: int, count: int):
+        return faiss.IndexFlatIP(dim)
+
+class FaissIVFIndex(FaissIndex):
+    """Inverted-file index: vectors are bucketed by k-means and only `nprobe` buckets are scanned"""
+    
+    backend = "ivf"
+    
+    def _create(self, dim: int, count: int):
+        # Keep roughly 39+ training points per centroid as FAISS recommends
+        nlist = max(1, min(RAG_IVF_NLIST, count // 39))
+        self.quantizer = faiss.IndexFlatIP(dim)
+        return faiss.IndexIVFFlat(self.quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    
+    def _configure(self):
+        faiss.extract_index_ivf(self.index).nprobe = RAG_IVF_NPROBE
+
+class FaissHNSWIndex(FaissIndex):
+    """Hierarchical navigable small-world graph for sub-linear approximate search"""
+    
+    backend = "hnsw"
+    
+    def _create(self, dim: int, count: int):
+        return faiss.IndexHNSWFlat(dim, RAG_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    
+    def _configure(self):
+        self.index.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+
+VECTOR_INDEX_BACKENDS = {
+    BruteForceIndex.backend: BruteForceIndex,
+    FaissFlatIndex.backend: FaissFlatIndex,
+    FaissIVFIndex.backend: FaissIVFIndex,
+    FaissHNSWIndex.backend: FaissHNSWIndex,
+}
+
+def create_vector_index(backend: str = RAG_INDEX_BACKEND) -> VectorIndex:
+    """Create the configured index, falling back to brute force when FAISS is unavailable"""
+    index_cls = VECTOR_INDEX_BACKENDS.get(backend)
+    if index_cls is None:
+        print(f"❌ Unknown vector index backend '{backend}', using brute force")
+        return BruteForceIndex()
+    
+    if issubclass(index_cls, FaissIndex) and faiss is None:
+        print("📦 faiss not installed, using brute-force search: pip install faiss-cpu")
+        return BruteForceIndex()
+    
+    return index_cls()
@@ -0,0 +1,31 @@
+# tests/test_book_ingestion.py - Streaming JSON Reader Regression Tests
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+from src.vector_space.book_ingestion import iter_json_items
+
+DOCUMENTS = [
+    '[\n 0.5\n]',
+    '{"k0": 0.5}',
+    '[123, -4.5e+3, 1E-2, 0, true, null, "12.5"]',
+    '{"a": 12345, "b": [1.25, {"c": -0.001}], "d": 6.02e23}',
+    '[{"text": "wu wei", "chapter": 17}, {"text": "ren", "chapter": 3.5}]',
+]
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("chunk_size", range(1, 9))
+def test_streamed_items_match_json_load(tmp_path, document, chunk_size):
+    path = tmp_path / "book.json"
+    path.write_text(document, encoding="utf-8")
+    expected = json.loads(document)
+    
+    items = list(iter_json_items(path, chunk_size=chunk_size))
+    
+    if isinstance(expected, dict):
+        assert dict(items) == expected
+    else:
+        assert items == expected